@@ -0,0 +1,206 @@
+import os
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from bson.errors import InvalidDocument
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, PyMongoError
+
+# ======================================================
+# Buffered Action Logging
+# ======================================================
+# Audit events (searches, views, ...) are queued in memory and written
+# to the user_actions collection with insert_many from one background
+# thread, so a page never waits on a Mongo round trip to log an action.
+#
+#   action_log.log_action(user_id, "search", "TCS")
+#
+# A batch is written when BATCH_SIZE events are queued or FLUSH_SECONDS
+# after the first one, whichever comes first, and once more at exit.
+#
+# A batch Mongo keeps rejecting (a validation error, an oversized value)
+# is retried MAX_ATTEMPTS times and then written one event at a time:
+# the events that still fail are logged, dropped and kept in
+# dead_letters, so they never block newer events. Lost connections
+# are simply retried.
+
+BATCH_SIZE = int(os.getenv("ACTION_LOG_BATCH_SIZE", "100"))
+FLUSH_SECONDS = float(os.getenv("ACTION_LOG_FLUSH_SECONDS", "2"))
+MAX_PENDING = int(os.getenv("ACTION_LOG_MAX_PENDING", "10000"))
+
+MAX_ATTEMPTS = 3
+DEAD_LETTERS = 100
+
+DUPLICATE_KEY = 11000
+
+logger = logging.getLogger(__name__)
+
+
+class ActionLogger:
+    def __init__(self, collection, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS, max_pending=MAX_PENDING, on_write=None):
+        self.collection = collection
+        # Called with each batch after it is stored (e.g. summary counters)
+        self.on_write = on_write
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+
+        # Oldest events are dropped if Mongo is unreachable for a long time
+        self._pending = deque(maxlen=max_pending)
+        self._wake = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._stopped = False
+        self._failures = 0
+        self.dead_letters = deque(maxlen=DEAD_LETTERS)
+
+        self._thread = threading.Thread(target=self._run, name="action-log", daemon=True)
+        self._thread.start()
+
+    def log(self, event):
+        with self._wake:
+            self._pending.append(event)
+            # First event starts the FLUSH_SECONDS timer; a full batch
+            # is written right away
+            if len(self._pending) == 1 or len(self._pending) >= self.batch_size:
+                self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._wake:
+                if not self._pending and not self._stopped:
+                    self._wake.wait()
+                if self._pending and len(self._pending) < self.batch_size and not self._stopped:
+                    self._wake.wait(self.flush_seconds)
+                stopped = self._stopped
+
+            if not self.flush() and not stopped:
+                # Mongo is unreachable; back off instead of spinning
+                with self._wake:
+                    self._wake.wait(self.flush_seconds)
+            if stopped:
+                return
+
+    def _take_batch(self):
+        with self._wake:
+            count = min(len(self._pending), self.batch_size)
+            return [self._pending.popleft() for _ in range(count)]
+
+    def flush(self):
+        """
+        Writes everything queued so far. Safe to call from any thread.
+        Returns False if a write failed (the events stay queued).
+        """
+        with self._write_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return True
+
+                stored, ok = self._insert(batch)
+                if stored and self.on_write is not None:
+                    try:
+                        self.on_write(stored)
+                    except Exception as e:
+                        # Events are stored; the summary job will catch up
+                        logger.warning("Action log on_write failed: %s", e)
+                if not ok:
+                    return False
+
+    def _insert(self, batch):
+        # Returns (events stored, False if some were put back)
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Duplicates only: a retried batch, stored last time
+            if not _only_duplicates(e):
+                return self._failed(batch, e)
+        except (PyMongoError, InvalidDocument) as e:
+            return self._failed(batch, e)
+
+        self._failures = 0
+        return batch, True
+
+    def _failed(self, batch, error):
+        if not isinstance(error, ConnectionFailure):
+            self._failures += 1
+        if isinstance(error, ConnectionFailure) or self._failures < MAX_ATTEMPTS:
+            self._requeue(batch, error)
+            return [], False
+
+        # The same events keep failing: find the bad ones
+        self._failures = 0
+        stored = []
+        for i, event in enumerate(batch):
+            try:
+                self.collection.insert_one(event)
+            except DuplicateKeyError:
+                pass
+            except ConnectionFailure as e:
+                self._requeue(batch[i:], e)
+                return stored, False
+            except (PyMongoError, InvalidDocument) as e:
+                logger.error("Action log dropped an event Mongo rejects (%s): %.200r", e, event)
+                self.dead_letters.append((event, str(e)))
+                continue
+            stored.append(event)
+        return stored, True
+
+    def _requeue(self, batch, error):
+        # Put the batch back and retry on the next flush
+        with self._wake:
+            self._pending.extendleft(reversed(batch))
+        logger.warning("Action log flush failed (%d pending): %s", len(self._pending), error)
+
+    def close(self):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+        self._thread.join(timeout=10)
+        self.flush()
+
+
+def _only_duplicates(error):
+    details = error.details or {}
+    errors = details.get("writeErrors", [])
+    return bool(errors) and not details.get("writeConcernErrors") and all(
+        err.get("code") == DUPLICATE_KEY for err in errors
+    )
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def get_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                from mongo_db import actions_col
+                from user_summary import record_actions
+                _logger = ActionLogger(actions_col, on_write=record_actions)
+                atexit.register(_logger.close)
+    return _logger
+
+
+def log_action(user_id, action, value=None, **fields):
+    """
+    Queues one audit event; returns immediately. The _id is assigned
+    here, so its embedded time (used for the admin date filters and
+    ordering) is when the event happened, not when it was flushed.
+    """
+    get_logger().log({
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "action": action,
+        "value": value,
+        "timestamp": datetime.now(timezone.utc),
+        **fields,
+    })
+
+
+def flush():
+    if _logger is not None:
+        _logger.flush()
@@ -1,16 +1,37 @@
+import logging
+
 import bcrypt
+from pymongo.errors import DuplicateKeyError
 from mongo_db import users_col
+import user_summary
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------
+# USERNAME LOOKUP
+# ---------------------------------
+def normalize_username(username):
+    # Stored as users.username_lower (unique index, see db_indexes.py)
+    return username.lower()
+
+
+def find_user(username):
+    """
+    Case-insensitive exact match (Madhu == madhu) on the indexed
+    username_lower field.
+    """
+    return users_col.find_one({"username_lower": normalize_username(username)})
+
 
 # ---------------------------------
 # LOGIN USER
 # ---------------------------------
 def login_user(username, password):
-    if users_col is None:
-        return False
-
-    user = users_col.find_one({
-        "username": {"$regex": f"^{username}$", "$options": "i"}
-    })
+    """
+    Returns the user document when the credentials match, else False.
+    """
+    user = find_user(username)
 
     if not user:
         return False
@@ -19,7 +40,7 @@ def login_user(username, password):
 
     # ✅ FIX: Support Plain Text Passwords (for Admin Visibility)
     if stored_password == password:
-         return True
+         return user
          
     # Fallback to bcrypt for existing hashed passwords
     try:
@@ -31,10 +52,9 @@ def login_user(username, password):
                  # If it's a string but doesn't look like a hash, and didn't match above, it's just wrong
                  return False
 
-        return bcrypt.checkpw(
-            password.encode("utf-8"),
-            stored_password
-        )
+        if bcrypt.checkpw(password.encode("utf-8"), stored_password):
+            return user
+        return False
     except:
         return False
 
@@ -46,7 +66,7 @@ def signup_user(username, password, email, mobile):
     if len(password) < 8:
          return False
     # ✅ Case-insensitive check to prevent collisions (Madhu vs madhu)
-    if users_col.find_one({"username": {"$regex": f"^{username}$", "$options": "i"}}):
+    if find_user(username):
          return False
 
     # ❌ DISABLED: bcrypt.hashpw (User requested visible passwords)
@@ -55,11 +75,21 @@ def signup_user(username, password, email, mobile):
     #     bcrypt.gensalt()
     # )
 
-    users_col.insert_one({
-        "username": username,
-        "password": password,  # ✅ STORE AS PLAIN TEXT
-        "email": email,
-        "mobile": mobile
-    })
+    try:
+        result = users_col.insert_one({
+            "username": username,
+            "username_lower": normalize_username(username),
+            "password": password,  # ✅ STORE AS PLAIN TEXT
+            "email": email,
+            "mobile": mobile
+        })
+    except DuplicateKeyError:
+        # Same name signed up concurrently; the unique index caught it
+        return False
 
+    try:
+        user_summary.record_signup(result.inserted_id, username)
+    except Exception as e:
+        # The account exists; the summary rebuild will add it
+        logger.warning("User summary update failed for new user %s: %s", result.inserted_id, e)
     return True
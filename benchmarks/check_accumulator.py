@@ -0,0 +1,120 @@
+"""
+Regression check: MetricAccumulator vs a full recompute.
+
+Seeds an accumulator, feeds it one bar at a time and, every --every
+bars, compares its metrics with compute_metrics_matrix on the same
+trailing window. The run is long enough for old rows to be evicted,
+for the buffers to be compacted and for an evicted peak to force a
+drawdown re-scan. Also checks that a pickled accumulator extends
+correctly.
+
+Run from the repo root:
+    python benchmarks/check_accumulator.py
+    python benchmarks/check_accumulator.py --bars 1000 --every 10
+
+Exits with status 1 on the first mismatch.
+"""
+import argparse
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("PERF_LOG_LEVEL", "WARNING")  # keep the span log out of the report
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metric_calculator
+
+MARKET_TICKER = "MKT"
+SEED_DAYS = 2700
+RTOL = 1e-9
+ATOL = 1e-12
+
+
+# --------------------------------------------------------------
+# Synthetic Prices (business days)
+# --------------------------------------------------------------
+def synthetic_prices(n_days, n_columns=60, seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2014-01-01", periods=n_days)
+    log_returns = rng.normal(0.0004, 0.02, size=(n_days, n_columns))
+    log_returns[:, 5] = 0                   # constant price
+    log_returns[1500:1520, 7] = -0.08       # deep drawdown that later leaves the window
+    prices = 100 * np.exp(np.cumsum(log_returns, axis=0))
+
+    data = pd.DataFrame(prices, index=dates, columns=[f"SYN{i:04d}.NS" for i in range(n_columns)])
+    data[MARKET_TICKER] = data.iloc[:, 10:20].mean(axis=1)
+    return data
+
+
+def mismatch(accumulator, data):
+    """
+    None if the accumulator matches a full recompute over `data`,
+    else a description of the first column that differs.
+    """
+    expected = metric_calculator.compute_metrics_matrix(
+        metric_calculator.window_prices(data), MARKET_TICKER
+    ).set_index("Ticker")
+    actual = accumulator.metrics().set_index("Ticker")
+
+    if list(expected.index) != list(actual.index):
+        return f"tickers differ ({len(expected)} expected, {len(actual)} got)"
+
+    for column in expected.columns:
+        a = expected[column].to_numpy(dtype=float)
+        b = actual[column].to_numpy(dtype=float)
+        if not np.allclose(a, b, rtol=RTOL, atol=ATOL, equal_nan=True):
+            return f"{column}: max abs diff {np.nanmax(np.abs(a - b)):.3g}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bars", type=int, default=500, help="bars fed after the seed window")
+    parser.add_argument("--every", type=int, default=50, help="compare after every N bars")
+    args = parser.parse_args()
+
+    data = synthetic_prices(SEED_DAYS + args.bars)
+    dates = data.index
+
+    accumulator = metric_calculator.MetricAccumulator(data.iloc[:SEED_DAYS], MARKET_TICKER)
+    checks = [SEED_DAYS] + [
+        end for end in range(SEED_DAYS + 1, len(dates) + 1)
+        if (end - SEED_DAYS) % args.every == 0 or end == len(dates)
+    ]
+
+    fed = SEED_DAYS
+    for end in checks:
+        for i in range(fed, end):
+            accumulator.update(dates[i], data.iloc[i])
+        fed = end
+
+        problem = mismatch(accumulator, data.iloc[:end])
+        if problem:
+            print(f"FAIL after {end - SEED_DAYS} bars: {problem}")
+            return 1
+
+    restored = pickle.loads(pickle.dumps(accumulator))
+    if not restored.matches(data):
+        print("FAIL: pickled accumulator does not match its own prices")
+        return 1
+
+    next_day = data.iloc[[-1]] * 1.001
+    next_day.index = [dates[-1] + pd.offsets.BDay()]
+    extended = pd.concat([data, next_day])
+    if restored.extend(extended) != 1:
+        print("FAIL: extend did not add exactly the new bar")
+        return 1
+    problem = mismatch(restored, extended)
+    if problem:
+        print(f"FAIL after extend: {problem}")
+        return 1
+
+    print(f"OK: {len(checks)} comparisons over {args.bars} bars, plus pickle + extend")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Regression check: parallel_metrics_matrix vs compute_metrics_matrix.
+
+Each shard runs the serial kernels on its own columns, so the parallel
+result must be bit-identical to the serial one (compared with
+check_exact). The synthetic universe has a late listing, a one-day hole
+(which drops that row for every column), a constant series, the market
+in the middle, at either end or missing, and widths smaller than the
+number of workers.
+
+Run from the repo root:
+    python benchmarks/check_parallel.py
+    python benchmarks/check_parallel.py --columns 800 --workers 3
+
+Exits with status 1 on the first mismatch.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("PERF_LOG_LEVEL", "WARNING")  # keep the span log out of the report
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metric_calculator
+
+MARKET_TICKER = "^NSEI"
+
+
+# --------------------------------------------------------------
+# Synthetic Price Matrix (business days)
+# --------------------------------------------------------------
+def synthetic_prices(n_columns, n_days=2700, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-06-01", periods=n_days)
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, size=(n_days, n_columns)), axis=0))
+    prices[:400, 11] = np.nan       # late listing
+    prices[1000, 50] = np.nan       # one-day hole
+    prices[:, 77] = 55.0            # constant price
+
+    columns = [f"SYN{i:04d}.NS" for i in range(n_columns)]
+    columns[n_columns // 2] = MARKET_TICKER
+    return pd.DataFrame(prices, index=dates, columns=columns)
+
+
+def compare(label, data, market_ticker, workers):
+    expected = metric_calculator.compute_metrics_matrix(data, market_ticker)
+    actual = metric_calculator.parallel_metrics_matrix(data, market_ticker, workers=workers)
+    try:
+        pd.testing.assert_frame_equal(expected, actual, check_exact=True)
+    except AssertionError as e:
+        print(f"FAIL {label}:\n{e}")
+        return False
+    print(f"  ok  {label} ({len(actual)} tickers)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--columns", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    data = metric_calculator.window_prices(synthetic_prices(max(args.columns, 100)))
+    tickers = list(data.columns)
+    market = tickers.index(MARKET_TICKER)
+
+    cases = [
+        ("market in the middle", data, MARKET_TICKER),
+        ("market first", data, tickers[0]),
+        ("market last", data, tickers[-1]),
+        ("no market column", data, "MISSING"),
+    ]
+    cases += [
+        (f"{width} column(s)", data.iloc[:, market:market + width], MARKET_TICKER)
+        for width in (1, 2, 3, args.workers + 1)
+    ]
+
+    start = time.perf_counter()
+    for label, frame, market_ticker in cases:
+        if not compare(label, frame, market_ticker, args.workers):
+            return 1
+
+    print(f"OK: {len(cases)} cases identical ({time.perf_counter() - start:.1f}s)")
+    return 0
+
+
+# The pool may spawn workers that re-import this module
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Speed comparison: per-ticker loop vs column-wise compute_metrics.
+
+Run from the repo root:
+    python benchmarks/metrics_speedup.py
+    python benchmarks/metrics_speedup.py --columns 50 300 2000
+"""
+import argparse
+import os
+import sys
+import time
+from math import sqrt
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metric_calculator
+
+MARKET_TICKER = "^NSEI"
+
+
+# --------------------------------------------------------------
+# Synthetic Price Matrix (10y of business days)
+# --------------------------------------------------------------
+def synthetic_prices(n_columns, n_days=2610, seed=42):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end="2025-12-31", periods=n_days)
+    log_returns = rng.normal(0.0004, 0.018, size=(n_days, n_columns))
+    prices = 100 * np.exp(np.cumsum(log_returns, axis=0))
+    columns = [f"SYN{i:04d}.NS" for i in range(n_columns - 1)] + [MARKET_TICKER]
+    return pd.DataFrame(prices, index=dates, columns=columns)
+
+
+# --------------------------------------------------------------
+# Reference: the original per-ticker loop
+# --------------------------------------------------------------
+def loop_metrics(data, market_ticker, risk_free_rate=0.06):
+    trading_days = metric_calculator.TRADING_DAYS
+
+    daily_returns = data.pct_change().dropna().clip(lower=-0.5, upper=0.5)
+    cummax_df = data.cummax()
+    max_drawdowns = ((data / cummax_df) - 1).min()
+
+    market_ret = daily_returns[market_ticker]
+    market_var = market_ret.var()
+
+    results = []
+    for ticker in data.columns:
+        series = data[ticker].dropna()
+        ret_series = daily_returns[ticker].dropna()
+
+        total_return = (1 + ret_series).prod()
+        cagr = total_return ** (trading_days / len(ret_series)) - 1
+        volatility = ret_series.std() * sqrt(trading_days)
+        downside_std = ret_series[ret_series < 0].std() * sqrt(trading_days)
+        mdd = max_drawdowns[ticker]
+
+        results.append({
+            "Ticker": ticker,
+            "CAGR": cagr,
+            "Volatility": volatility,
+            "Sharpe": (cagr - risk_free_rate) / volatility,
+            "Sortino": (cagr - risk_free_rate) / downside_std,
+            "Calmar": cagr / abs(mdd) if mdd != 0 else np.nan,
+            "MaxDrawdown": mdd,
+            "Beta": ret_series.cov(market_ret) / market_var,
+            "RecoveryDays": metric_calculator.calculate_recovery_days(
+                series, cummax_df[ticker]
+            ),
+        })
+
+    return pd.DataFrame(results)
+
+
+def best_of(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--columns", type=int, nargs="+", default=[50, 300, 2000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'columns':>8} {'loop (s)':>10} {'matrix (s)':>11} {'speedup':>8}")
+    for n_columns in args.columns:
+        data = synthetic_prices(n_columns)
+
+        loop_time = best_of(lambda: loop_metrics(data, MARKET_TICKER), args.repeats)
+        matrix_time = best_of(
+            lambda: metric_calculator.compute_metrics_matrix(data, MARKET_TICKER),
+            args.repeats
+        )
+
+        print(
+            f"{n_columns:>8} {loop_time:>10.3f} {matrix_time:>11.3f} "
+            f"{loop_time / matrix_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Benchmark for the analytics pipeline: fetch -> metrics -> ranking.
+
+Builds synthetic 10-year price fixtures, runs every stage through the
+real code paths (local market data provider, empty price store) and
+reports wall time and peak traced memory per stage.
+
+Run from the repo root:
+    python benchmarks/pipeline.py                      # 50 / 500 / 5000 tickers
+    python benchmarks/pipeline.py --sizes 50 500 --save-baseline
+    python benchmarks/pipeline.py --sizes 50 500 --compare
+    python benchmarks/pipeline.py --sizes 500 --compact  # + float32 stages
+
+--compare exits with status 1 when any stage is slower, or peaks at
+more traced memory, than the stored baseline by more than --tolerance
+(default 25%).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+# Fixtures and store live in a scratch folder; must be set before the app
+# modules read their configuration at import time.
+WORK_DIR = tempfile.mkdtemp(prefix="pipeline-bench-")
+os.environ["MARKET_DATA_PROVIDER"] = "local"
+os.environ["MARKET_FIXTURES_DIR"] = os.path.join(WORK_DIR, "fixtures")
+os.environ["PRICE_STORE_DIR"] = os.path.join(WORK_DIR, "store")
+os.environ["SHARED_CACHE"] = "off"  # measure the real work, not cache reads
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+import data_fetch
+import instrumentation
+import market_provider
+import metric_calculator
+import price_store
+import scoring_system
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MARKET_TICKER = "^NSEI"
+N_DAYS = 10 * 261
+
+
+# --------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------
+def write_fixtures(n_tickers):
+    provider = market_provider.LocalProvider()
+    symbols = [f"SYN{i:05d}.NS" for i in range(n_tickers - 1)] + [MARKET_TICKER]
+
+    for i, symbol in enumerate(symbols):
+        if not os.path.exists(provider.path(symbol)):
+            provider.write(symbol, market_provider.synthetic_ohlcv(N_DAYS, seed=i))
+
+    return symbols
+
+
+# --------------------------------------------------------------
+# Stage Runner
+# --------------------------------------------------------------
+def measure(fn):
+    # memory_span rather than the raw tracemalloc peak: stages that
+    # report their own memory (compact mode) reset that peak
+    tracemalloc.start()
+    start = time.perf_counter()
+    with instrumentation.memory_span("benchmark.stage") as usage:
+        result = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+    return result, elapsed, usage["alloc_bytes"]
+
+
+def run_pipeline(symbols, compact=False):
+    """
+    One pass over every stage. Caches are cleared first so each stage
+    does its full work.
+    """
+    data_fetch.clear_cache()
+    scoring_system.rank_with_weights.clear()
+    shutil.rmtree(price_store.STORE_DIR, ignore_errors=True)
+
+    # Uncached engine so the metrics stage is never a cache hit
+    def compute_metrics(data, market_ticker):
+        return metric_calculator.compute_metrics_matrix(
+            metric_calculator.window_prices(data), market_ticker
+        )
+    stages = {}
+
+    data, *stages["fetch_cold"] = measure(lambda: data_fetch.fetch_stock_data(symbols))
+    data_fetch.clear_cache()
+    data, *stages["fetch_warm"] = measure(lambda: data_fetch.fetch_stock_data(symbols))
+
+    prices = data.to_numpy()
+    running_max = np.fmax.accumulate(prices, axis=0)
+    _, *stages["recovery_days"] = measure(
+        lambda: metric_calculator.recovery_days_matrix(prices, running_max, data.index.values)
+    )
+
+    metrics, *stages["compute_metrics"] = measure(lambda: compute_metrics(data, MARKET_TICKER))
+    _, *stages["rank_with_weights"] = measure(lambda: scoring_system.rank_stocks(metrics))
+
+    scoring_system.rank_with_weights.clear()
+    _, *stages["sensitivity_analysis"] = measure(
+        lambda: scoring_system.run_sensitivity_analysis(metrics)
+    )
+
+    if compact:
+        # float32 PriceMatrix path for the same universe (warm store)
+        del data, prices, running_max
+        data_fetch.clear_cache()
+        matrix, *stages["fetch_compact"] = measure(lambda: data_fetch.fetch_price_matrix(symbols))
+        _, *stages["compute_metrics_compact"] = measure(
+            lambda: metric_calculator.compute_metrics_compact(matrix, MARKET_TICKER)
+        )
+
+    return stages
+
+
+def best_of(symbols, repeats, compact=False):
+    # Fastest time per stage, largest peak memory per stage
+    runs = [run_pipeline(symbols, compact) for _ in range(repeats)]
+    return {
+        stage: {
+            "seconds": min(run[stage][0] for run in runs),
+            "peak_mb": max(run[stage][1] for run in runs) / 1e6,
+        }
+        for stage in runs[0]
+    }
+
+
+# --------------------------------------------------------------
+# Reporting
+# --------------------------------------------------------------
+def print_report(size, stages, baseline=None):
+    total = sum(s["seconds"] for s in stages.values())
+    print(f"\n{size} tickers x {N_DAYS} days  (total {total:.3f}s)")
+    print(f"  {'stage':<24} {'seconds':>9} {'peak MB':>9} {'vs baseline':>12}")
+
+    for stage, s in stages.items():
+        ratio = ""
+        if baseline and stage in baseline:
+            ratio = f"{s['seconds'] / baseline[stage]['seconds']:.2f}x"
+        print(f"  {stage:<24} {s['seconds']:>9.3f} {s['peak_mb']:>9.1f} {ratio:>12}")
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for size, stages in results.items():
+        for stage, s in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if not base:
+                continue
+            if s["seconds"] > base["seconds"] * (1 + tolerance):
+                found.append(f"{size} tickers / {stage}: {s['seconds']:.3f}s vs {base['seconds']:.3f}s")
+            if "peak_mb" in base and s["peak_mb"] > base["peak_mb"] * (1 + tolerance):
+                found.append(f"{size} tickers / {stage}: {s['peak_mb']:.1f} MB vs {base['peak_mb']:.1f} MB")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fetch -> metrics -> ranking.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--compact", action="store_true", help="also run the float32 compact stages")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for size in args.sizes:
+        symbols = write_fixtures(size)
+        results[str(size)] = best_of(symbols, args.repeats, args.compact)
+        print_report(size, results[str(size)], baseline.get(str(size)))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.compare:
+        found = regressions(results, baseline, args.tolerance)
+        if found:
+            print("\nRegressions:")
+            for line in found:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -1,12 +1,24 @@
-import yfinance as yf
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+import instrumentation
+import price_store
+import price_matrix
+import shared_cache
+from market_provider import get_provider
+from fetch_scheduler import get_scheduler
+
 
 @st.cache_data(ttl=3600)
 def get_stock_data(symbol):
     try:
-        data = yf.download(symbol, start="2021-01-01", progress=False)
+        data = get_provider().download([symbol], start="2021-01-01")
         if data.empty:
             return pd.DataFrame()
         
@@ -111,34 +123,384 @@ BLUECHIP_TICKERS = [
     "TATACONSUM", "TATASTEEL", "TCS", "TECHM", "TITAN", "ULTRACEMCO", "UPL", "WIPRO"
 ]
 
+# --------------------------------------------------------------
+# PER-SYMBOL CACHE
+# --------------------------------------------------------------
+# Pages request overlapping but different ticker lists (bluechip,
+# sector, company, profile...). Caching per (symbol, period) lets any
+# list be assembled from columns already in memory; only the misses
+# go to the local store / Yahoo, in one batch.
+CACHE_TTL = timedelta(hours=24)
+
+# Symbols that returned no data are retried sooner
+MISS_TTL = timedelta(minutes=15)
+
+_symbol_cache = {}
+_symbol_cache_lock = threading.Lock()
+
+
+def _cache_lookup(symbols, period):
+    now = datetime.now()
+    hits, misses = {}, []
+
+    with _symbol_cache_lock:
+        for symbol in symbols:
+            entry = _symbol_cache.get((symbol, period))
+            if entry is not None:
+                series, cached_at = entry
+                ttl = CACHE_TTL if series is not None else MISS_TTL
+                if now - cached_at < ttl:
+                    if series is not None:
+                        hits[symbol] = series
+                    continue
+            misses.append(symbol)
+
+    return hits, misses
+
+
+def _cache_store(symbols, loaded, period):
+    now = datetime.now()
+    with _symbol_cache_lock:
+        for symbol in symbols:
+            _symbol_cache[(symbol, period)] = (loaded.get(symbol), now)
+
+
+def clear_cache():
+    with _symbol_cache_lock:
+        _symbol_cache.clear()
+    with _frame_memo_lock:
+        _frame_memo.clear()
+
+
+# --------------------------------------------------------------
+# SINGLE-FLIGHT LOADS
+# --------------------------------------------------------------
+# At market open many sessions ask for the same tickers at once. The
+# first caller to miss a (symbol, period) owns its load; later callers
+# wait for that load instead of starting their own download. Works per
+# symbol, so overlapping lists (bluechip vs a sector) share too.
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.loaded = None  # stays None if the owner failed
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _load_coalesced(symbols, period, incremental):
+    with _inflight_lock:
+        # Loads that finished since our cache lookup
+        loaded, symbols = _cache_lookup(symbols, period)
+
+        waiting = {s: _inflight[(s, period)] for s in symbols if (s, period) in _inflight}
+        owned = [s for s in symbols if s not in waiting]
+
+        flight = _Flight()
+        for symbol in owned:
+            _inflight[(symbol, period)] = flight
+
+    if owned:
+        try:
+            flight.loaded = load_close_series(owned, period, incremental)
+            _cache_store(owned, flight.loaded, period)
+            loaded.update(flight.loaded)
+        finally:
+            with _inflight_lock:
+                for symbol in owned:
+                    _inflight.pop((symbol, period), None)
+            flight.done.set()
+
+    if waiting:
+        retry = []
+        with instrumentation.span("fetch_stock_data.coalesced_wait", symbols=len(waiting)):
+            for symbol, other in waiting.items():
+                other.done.wait()
+                if other.loaded is None:
+                    retry.append(symbol)
+                elif symbol in other.loaded:
+                    loaded[symbol] = other.loaded[symbol]
+
+        # The owner's load raised; try these ourselves
+        if retry:
+            retried = load_close_series(retry, period, incremental)
+            _cache_store(retry, retried, period)
+            loaded.update(retried)
+
+    return loaded
+
+
 # --------------------------------------------------------------
 # DATA FETCHER (FINAL, CORRECTED)
 # --------------------------------------------------------------
+def nse_symbol(ticker):
+    # Indices (^NSEI) and already-suffixed symbols pass through
+    return ticker if ticker.endswith(".NS") or ticker.startswith("^") else f"{ticker}.NS"
+
+
+def _fetch_key(tickers, period="10y", incremental=True):
+    return sorted(set(nse_symbol(t) for t in tickers)), period, incremental
+
+
+def _fetch_ttl(data, tickers, period="10y", incremental=True):
+    # Failed downloads are not shared with other workers, and frames
+    # missing requested symbols (given up on, or too short) expire like
+    # a per-symbol miss so the symbols are retried soon
+    if data.empty:
+        return 0
+    if len(data.columns) < len(_fetch_key(tickers)[0]):
+        return MISS_TTL.total_seconds()
+    return 3600
+
+
+# --------------------------------------------------------------
+# ASSEMBLED FRAMES (this process)
+# --------------------------------------------------------------
+# Finished fetch_stock_data frames, kept for as long as _fetch_ttl
+# allows, so a warm call never touches the shared cache (which means
+# reading and unpickling the whole frame). Least recently used first
+# out.
+FRAME_MEMO_SIZE = 32
+
+_frame_memo = OrderedDict()
+_frame_memo_lock = threading.Lock()
+
+
+def _memo_get(key):
+    with _frame_memo_lock:
+        entry = _frame_memo.get(key)
+        if entry is None:
+            return None
+        data, expires = entry
+        if expires < time.monotonic():
+            del _frame_memo[key]
+            return None
+        _frame_memo.move_to_end(key)
+    # New frame object over the same data (copy-on-write): a caller that
+    # changes it never changes what the next caller gets
+    return data.copy(deep=False)
+
+
+def _memo_set(key, data, seconds):
+    with _frame_memo_lock:
+        _frame_memo[key] = (data, time.monotonic() + seconds)
+        _frame_memo.move_to_end(key)
+        while len(_frame_memo) > FRAME_MEMO_SIZE:
+            _frame_memo.popitem(last=False)
+
+
 # Used in: pages/company.py
-@st.cache_data(ttl=86400, show_spinner=False)
-def fetch_stock_data(tickers, period="10y"):
+@instrumentation.timed("fetch_stock_data")
+def fetch_stock_data(tickers, period="10y", incremental=True):
+    """
+    Close prices for `tickers` (NSE symbols or bare tickers), one column
+    each, filled and trimmed to symbols with enough history. Served from
+    this process first, then from the shared cache, then built from the
+    per-symbol cache / store / provider.
+    """
+    key = repr(_fetch_key(tickers, period, incremental))
+    data = _memo_get(key)
+    if data is not None:
+        return data
+
+    data = _fetch_stock_data_shared(tickers, period, incremental)
+    seconds = _fetch_ttl(data, tickers, period, incremental)
+    if seconds:
+        _memo_set(key, data, seconds)
+    return data.copy(deep=False)
+
+
+@shared_cache.cached("fetch_stock_data", ttl=_fetch_ttl, key=_fetch_key)
+def _fetch_stock_data_shared(tickers, period="10y", incremental=True):
 
     if not tickers:
         return pd.DataFrame()
 
     # Ensure proper NSE symbols
-    processed_tickers = sorted([
-        t if t.endswith(".NS") or t.startswith("^") else f"{t}.NS"
-        for t in tickers
-    ])
+    processed_tickers = sorted(set(nse_symbol(t) for t in tickers))
 
-    try:
-        raw_data = yf.download(
-            processed_tickers,
-            period=period,
-            progress=False,
-            auto_adjust=True,   # 🔥 CRITICAL FIX
-            threads=True
-        )
-    except Exception as e:
-        print(f"Data Download Error: {e}")
+    columns, misses = _cache_lookup(processed_tickers, period)
+
+    if misses:
+        columns.update(_load_coalesced(misses, period, incremental))
+
+    return close_frame(columns, processed_tickers)
+
+
+def close_frame(columns, symbols):
+    """
+    fetch_stock_data's frame out of {symbol: close series} (e.g. from
+    load_close_series): one column per symbol in `symbols` order,
+    filled, and without symbols that have too little history.
+    """
+    if not columns:
         return pd.DataFrame()
 
+    data = align_columns([
+        columns[t].to_frame(t) for t in symbols if t in columns
+    ]).sort_index()
+
+    # Clean missing data (in place: no extra copies of the matrix)
+    data.ffill(inplace=True)
+    data.bfill(inplace=True)
+
+    # Drop assets with insufficient history
+    threshold = int(0.80 * len(data))
+    data = data.dropna(axis=1, thresh=threshold)
+
+    return data
+
+
+@instrumentation.timed("fetch_price_matrix")
+def fetch_price_matrix(tickers, period="10y", incremental=True):
+    """
+    fetch_stock_data as a float32 PriceMatrix (see price_matrix.py),
+    filled one column at a time from the per-symbol series, so the
+    float64 matrix is never built. Same dates, tickers and filling.
+    """
+    processed_tickers = sorted(set(nse_symbol(t) for t in tickers))
+
+    columns, misses = _cache_lookup(processed_tickers, period)
+    if misses:
+        columns.update(_load_coalesced(misses, period, incremental))
+
+    symbols = [t for t in processed_tickers if t in columns]
+    if not symbols:
+        return price_matrix.PriceMatrix.empty()
+
+    dates = columns[symbols[0]].index
+    for t in symbols[1:]:
+        if not columns[t].index.equals(dates):
+            dates = dates.union(columns[t].index)
+    dates = dates.sort_values()
+
+    values = np.full((len(dates), len(symbols)), np.nan, dtype=price_matrix.DTYPE, order="F")
+    has_prices = np.zeros(len(symbols), dtype=bool)
+
+    for i, t in enumerate(symbols):
+        series = columns[t]
+        values[dates.get_indexer(series.index), i] = series.to_numpy()
+        has_prices[i] = price_matrix.fill_column(values[:, i])
+
+    # After filling a column is either complete or empty, so this drops
+    # what fetch_stock_data's 80% threshold drops
+    prices = price_matrix.PriceMatrix(values, dates, symbols)
+    return prices if has_prices.all() else prices.select(has_prices)
+
+
+def load_close_series(symbols, period="10y", incremental=True, max_age=None):
+    """
+    Close-price series per symbol for `period`: served from the local
+    store, with one batched download for whatever is missing or stale
+    (older than `max_age`, default price_store.MAX_AGE).
+
+    A store that cannot be written (disk full, permissions) only costs
+    the caching: stale symbols are served as stored and fresh downloads
+    straight from memory.
+    """
+    # ----------------------------------------------------------
+    # Local store first (survives restarts / redeploys)
+    # ----------------------------------------------------------
+    start = price_store.period_start(period)
+    manifest = price_store.read_manifest()
+
+    status = {
+        t: price_store.history_status(t, start, manifest, max_age)
+        for t in symbols
+    }
+    missing = [t for t in symbols if status[t] == "missing"]
+    stale = [t for t in symbols if status[t] == "stale"]
+
+    # ----------------------------------------------------------
+    # Stale tickers: only the bars after the last stored date
+    # ----------------------------------------------------------
+    if incremental:
+        try:
+            missing += refresh_tail(stale, manifest)
+        except Exception as e:
+            print(f"Price store write error (serving stored history): {e}")
+    else:
+        missing += stale
+
+    unsaved = pd.DataFrame()
+    if missing:
+        downloaded = download_close_prices(missing, period)
+        try:
+            price_store.save_prices(downloaded, start)
+        except Exception as e:
+            print(f"Price store write error (serving the download): {e}")
+            unsaved = downloaded
+
+    loaded = {}
+    for symbol in symbols:
+        if symbol in unsaved.columns:
+            series = unsaved[symbol].dropna()
+            series = series if not series.empty else None
+        else:
+            series = price_store.load_series(symbol, start)
+        if series is not None:
+            loaded[symbol] = series
+
+    return loaded
+
+
+# Days re-requested before the last stored bar to verify the overlap
+TAIL_OVERLAP_DAYS = 7
+
+
+def refresh_tail(symbols, manifest):
+    """
+    Delta download for stored tickers: requests only the bars since
+    each ticker's last stored date and appends them to the store.
+    Returns the tickers whose history must be re-downloaded in full.
+    """
+    by_last_date = {}
+    for symbol in symbols:
+        by_last_date.setdefault(price_store.last_date(symbol, manifest), []).append(symbol)
+
+    rebuild = []
+    for last, group in by_last_date.items():
+        since = last - pd.Timedelta(days=TAIL_OVERLAP_DAYS)
+        tail = download_close_prices(group, start=since)
+        rebuild += price_store.append_prices(tail)
+
+    return rebuild
+
+
+@instrumentation.timed("download_close_prices")
+def download_close_prices(symbols, period="10y", start=None):
+    """
+    Adjusted close prices from the market data provider (Yahoo unless
+    configured otherwise), one column per symbol, either for a whole
+    `period` or from `start` onwards.
+
+    Goes through the fetch scheduler (rate limit, bounded concurrency,
+    retries), so a throttled or failing batch costs only its own
+    symbols: the result holds every symbol that succeeded, and those
+    that did not are simply absent (retried on a later call).
+    """
+    window = start.strftime("%Y-%m-%d") if start is not None else None
+
+    def fetch_batch(batch):
+        # The scheduler owns concurrency; no extra threads per call.
+        # Only this batch's OHLCV frame is ever alive; Close is copied
+        # out and the rest is dropped when we return.
+        raw_data = get_provider().download(batch, period=period, start=window, threads=False)
+        return close_prices(raw_data, batch)
+
+    data, failed = get_scheduler().run(symbols, fetch_batch, combine=align_columns)
+    if failed:
+        print(f"Data Download Error: no data for {len(failed)} symbols: {', '.join(failed[:10])}")
+
+    return data
+
+
+def close_prices(raw_data, symbols):
+    """
+    Close columns (one per symbol, all-NaN columns dropped) out of a
+    provider download.
+    """
     if raw_data.empty:
         return pd.DataFrame()
 
@@ -148,19 +510,48 @@ def fetch_stock_data(tickers, period="10y"):
     if isinstance(raw_data.columns, pd.MultiIndex):
         data = raw_data["Close"]
     else:
-        data = raw_data
+        data = raw_data[["Close"]].rename(columns={"Close": symbols[0]})
 
     if isinstance(data, pd.Series):
-        data = data.to_frame()
+        data = data.to_frame(symbols[0])
 
-    # Clean missing data
-    data = data.ffill().bfill()
+    data = data.dropna(axis=1, how="all")
 
-    # Drop assets with insufficient history
-    threshold = int(0.80 * len(data))
-    data = data.dropna(axis=1, thresh=threshold)
+    # Fresh array: a slice (or pandas' lazy copy) of raw_data would keep
+    # all of OHLCV alive
+    return pd.DataFrame(
+        data.to_numpy(dtype=np.float64, copy=True),
+        index=data.index, columns=data.columns
+    )
 
-    return data
+
+def align_columns(frames):
+    """
+    Joins per-batch close frames on their shared (union) date index.
+    The output is one preallocated float64 block filled batch by batch,
+    instead of pd.concat's alignment copies of every input. Consumes
+    `frames` (the list is emptied).
+    """
+    dates = frames[0].index
+    for frame in frames[1:]:
+        if not frame.index.equals(dates):
+            dates = dates.union(frame.index)
+
+    symbols = [s for frame in frames for s in frame.columns]
+
+    # Column-major, so the DataFrame can wrap it without another copy
+    values = np.full((len(dates), len(symbols)), np.nan, order="F")
+
+    col = 0
+    while frames:
+        # Release each batch as soon as it is copied in
+        frame = frames.pop(0)
+        width = frame.shape[1]
+        rows = dates.get_indexer(frame.index)
+        values[rows, col:col + width] = frame.to_numpy(dtype=np.float64)
+        col += width
+
+    return pd.DataFrame(values, index=dates, columns=symbols, copy=False)
 
 
 # ==============================================================
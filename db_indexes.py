@@ -0,0 +1,165 @@
+"""
+MongoDB index management.
+
+Indexes are declared once in INDEXES and applied by running this
+module after a deploy that changes them; the app never builds indexes
+itself, so no page load waits on createIndexes. createIndexes is a
+no-op for indexes that already exist. BACKFILLS run first and fill in
+derived fields that older documents are missing.
+
+    python db_indexes.py            # apply and list the current state
+    python db_indexes.py --dedupe   # also delete duplicates that block
+                                    # a unique index (see DEDUPE)
+"""
+import sys
+import logging
+import argparse
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "users": [
+        # auth_utils.find_user: exact match on the lowercased name
+        ([("username_lower", ASCENDING)], {"name": "username_lower", "unique": True}),
+    ],
+    "user_summary": [
+        # admin users tab: keyset pages and prefix search by name
+        ([("username_lower", ASCENDING)], {"name": "username_lower"}),
+        # user_summary.needs_rebuild: any summary still marked partial
+        ([("partial", ASCENDING)], {"name": "partial", "sparse": True}),
+    ],
+    "user_actions": [
+        # admin activity log: newest-first pages, optionally per user or
+        # per action type. Date ranges are bounds on _id (ObjectIds embed
+        # their creation time), so each index also serves them.
+        ([("user_id", ASCENDING), ("_id", ASCENDING)], {"name": "user_id__id"}),
+        ([("action", ASCENDING), ("_id", ASCENDING)], {"name": "action__id"}),
+    ],
+    "watchlist": [
+        # add_to_watchlist upserts on this key; unique keeps it idempotent
+        ([("user_id", ASCENDING), ("ticker", ASCENDING)], {"name": "user_ticker", "unique": True}),
+        # profile: find({"user_id": ...})
+        ([("user_id", ASCENDING)], {"name": "user_id"}),
+    ],
+}
+
+
+def backfill_username_lower(db):
+    """
+    Users created before username_lower existed. Lowercased here with
+    auth_utils.normalize_username rather than $toLower, which only folds
+    ASCII, so non-ASCII names match what find_user looks up. Matches
+    nothing once every user has the field.
+    """
+    from auth_utils import normalize_username
+
+    missing = db["users"].find({"username_lower": {"$exists": False}}, {"username": 1})
+    updates = [
+        UpdateOne({"_id": user["_id"]}, {"$set": {"username_lower": normalize_username(user["username"])}})
+        for user in missing if isinstance(user.get("username"), str)
+    ]
+    if not updates:
+        return 0
+    return db["users"].bulk_write(updates, ordered=False).modified_count
+
+
+BACKFILLS = {
+    "users": backfill_username_lower,
+}
+
+
+def dedupe_watchlist(db):
+    """
+    Removes repeated (user_id, ticker) rows left by the old
+    find-then-insert path, keeping the oldest. Needed once before the
+    unique index can be built.
+    """
+    duplicates = db["watchlist"].aggregate([
+        {"$group": {
+            "_id": {"user_id": "$user_id", "ticker": "$ticker"},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+
+    extra = [_id for group in duplicates for _id in sorted(group["ids"])[1:]]
+    if extra:
+        db["watchlist"].delete_many({"_id": {"$in": extra}})
+    return len(extra)
+
+
+# Deletes data: run only with --dedupe, when a unique index cannot be
+# built because of duplicates
+DEDUPE = {
+    "watchlist": dedupe_watchlist,
+}
+
+
+def _create(db, name, keys, options, dedupe):
+    try:
+        db[name].create_index(keys, **options)
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY or name not in DEDUPE:
+            raise
+        if not dedupe:
+            logger.warning("%s has duplicates for %s; rerun with --dedupe to remove them", name, options.get("name"))
+            raise
+        removed = DEDUPE[name](db)
+        logger.warning("Removed %d duplicate documents from %s", removed, name)
+        db[name].create_index(keys, **options)
+
+
+def ensure_indexes(db, dedupe=False):
+    """
+    Creates every index in INDEXES. Failures are logged, not raised, and
+    reported through the return value. Duplicates blocking a unique
+    index are only deleted when `dedupe` is set.
+    """
+    ok = True
+    for name, indexes in INDEXES.items():
+        if name in BACKFILLS:
+            try:
+                updated = BACKFILLS[name](db)
+                if updated:
+                    logger.warning("Backfilled %d documents in %s", updated, name)
+            except PyMongoError as e:
+                ok = False
+                logger.warning("Backfill of %s failed: %s", name, e)
+
+        for keys, options in indexes:
+            try:
+                _create(db, name, keys, options, dedupe)
+            except PyMongoError as e:
+                ok = False
+                logger.warning("Could not create index %s on %s: %s", options.get("name"), name, e)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the indexes in INDEXES.")
+    parser.add_argument("--dedupe", action="store_true", help="delete duplicates that block a unique index")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from mongo_db import get_db
+    db = get_db()
+    ok = ensure_indexes(db, dedupe=args.dedupe)
+
+    for name in INDEXES:
+        print(f"{name}:")
+        for index in db[name].list_indexes():
+            print(f"  {index['name']:<20} {dict(index['key'])}{'  unique' if index.get('unique') else ''}")
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
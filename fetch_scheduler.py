@@ -0,0 +1,198 @@
+"""
+Rate-limited, retrying scheduler for market data downloads.
+
+A large request is split into batches that run on a bounded worker
+pool. Every provider call first takes a token from a shared token
+bucket, so the whole process stays under FETCH_RATE calls per second
+however many sessions are loading pages. Failed calls are retried with
+exponential backoff and full jitter. Symbols missing from a response
+that returned other symbols are a definitive miss (delisted or
+mistyped) and are not retried; a response with none of them is retried
+once, as it may be a silent throttle. Whatever still fails is reported
+back instead of failing the whole request:
+
+    data, failed = get_scheduler().run(symbols, fetch_batch)
+    # data: columns for the symbols that succeeded; failed: given up on
+
+Tuned with environment variables (defaults in brackets):
+    FETCH_RATE [2 for Yahoo, 0 = unlimited for local fixtures] calls/s,
+    FETCH_BURST [5], FETCH_WORKERS [4],
+    FETCH_BATCH_SIZE [25], FETCH_MAX_RETRIES [4],
+    FETCH_BACKOFF_BASE [1] s, FETCH_BACKOFF_MAX [30] s
+"""
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import instrumentation
+from market_provider import PROVIDER_NAME
+
+RATE = float(os.getenv("FETCH_RATE", "2" if PROVIDER_NAME == "yahoo" else "0"))
+BURST = int(os.getenv("FETCH_BURST", "5"))
+WORKERS = int(os.getenv("FETCH_WORKERS", "4"))
+BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "25"))
+MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("FETCH_BACKOFF_BASE", "1"))
+BACKOFF_MAX = float(os.getenv("FETCH_BACKOFF_MAX", "30"))
+
+# Retries for a response that came back with none of the requested
+# symbols (no error raised, e.g. a throttled Yahoo call)
+EMPTY_RETRIES = 1
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second, up to `capacity` saved for bursts.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available. Returns the seconds waited.
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+class FetchScheduler:
+    def __init__(self, rate=RATE, burst=BURST, workers=WORKERS, batch_size=BATCH_SIZE,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.bucket = TokenBucket(rate, burst)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._counters = {
+            "calls": 0, "retries": 0, "errors": 0,
+            "failed_symbols": 0, "throttled_seconds": 0.0,
+        }
+        self._counters_lock = threading.Lock()
+
+    # ----------------------------------------------------------
+    # Counters
+    # ----------------------------------------------------------
+    def _count(self, name, amount=1):
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        with self._counters_lock:
+            return dict(self._counters)
+
+    # ----------------------------------------------------------
+    # Scheduling
+    # ----------------------------------------------------------
+    def backoff(self, attempt):
+        # Full jitter: uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _call(self, fetch_batch, batch):
+        self._count("throttled_seconds", self.bucket.acquire())
+        self._count("calls")
+        return fetch_batch(batch)
+
+    def _run_batch(self, fetch_batch, batch):
+        """
+        One batch with retries. Returns (frame, failed symbols).
+        """
+        frames = []
+        pending = list(batch)
+        errors = empty_rounds = 0
+
+        while pending:
+            try:
+                frame = self._call(fetch_batch, pending)
+            except Exception as e:
+                self._count("errors")
+                if errors >= self.max_retries:
+                    logger.warning("Giving up on %d symbols after %d attempts: %s", len(pending), errors + 1, e)
+                    break
+                errors += 1
+                self._count("retries")
+                time.sleep(self.backoff(errors))
+                continue
+
+            got = [s for s in pending if s in frame.columns]
+            if got:
+                # The rest are simply not there; asking again only waits
+                frames.append(frame[got])
+                pending = [s for s in pending if s not in frame.columns]
+                break
+
+            if empty_rounds >= EMPTY_RETRIES:
+                break
+            empty_rounds += 1
+            self._count("retries")
+            time.sleep(self.backoff(empty_rounds))
+
+        data = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+        return data, pending
+
+    def run(self, symbols, fetch_batch, combine=None):
+        """
+        Calls fetch_batch(list_of_symbols) -> DataFrame (one column per
+        symbol returned) for every batch of `symbols`, in parallel under
+        the rate limit, and merges the results with combine(frames)
+        (default: outer-join concat). Returns (data, failed).
+        """
+        symbols = list(symbols)
+        batches = [symbols[i:i + self.batch_size] for i in range(0, len(symbols), self.batch_size)]
+
+        with instrumentation.span("fetch_scheduler.run", symbols=len(symbols), batches=len(batches)):
+            futures = [self.pool.submit(self._run_batch, fetch_batch, b) for b in batches]
+            results = [f.result() for f in futures]
+
+        frames = [data for data, _ in results if not data.empty]
+        failed = [s for _, batch_failed in results for s in batch_failed]
+        self._count("failed_symbols", len(failed))
+        del futures, results
+
+        if not frames:
+            return pd.DataFrame(), failed
+        if combine is not None:
+            return combine(frames), failed
+        return pd.concat(frames, axis=1).sort_index(), failed
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FetchScheduler()
+    return _scheduler
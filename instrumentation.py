@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import functools
+import contextvars
+import tracemalloc
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+# ======================================================
+# Hot-path Timing
+# ======================================================
+# Lightweight spans around data fetches, metric computation, ranking,
+# Mongo commands and page sections. Every span is:
+#   * attached to the current page request (begin_request)
+#   * added to process-wide per-name statistics
+#   * emitted as one JSON line on the "perf" logger
+#
+# Usage:
+#   instrumentation.begin_request("profile")
+#   with instrumentation.span("profile.watchlist"): ...
+#   @instrumentation.timed()           # on hot functions
+#   instrumentation.section("cards")   # sequential page sections
+#   with instrumentation.memory_span("scan.returns") as usage: ...
+#                                      # + bytes allocated (tracemalloc)
+
+RECENT_REQUESTS = 200
+SAMPLES_PER_SPAN = 1000
+
+logger = logging.getLogger("perf")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("PERF_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+_current_request = contextvars.ContextVar("perf_request", default=None)
+_depth = contextvars.ContextVar("perf_depth", default=0)
+_memory_frames = contextvars.ContextVar("perf_memory_frames", default=())
+
+_lock = threading.Lock()
+_recent = deque(maxlen=RECENT_REQUESTS)
+_samples = defaultdict(lambda: deque(maxlen=SAMPLES_PER_SPAN))
+
+
+def _session_id():
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return ctx.session_id if ctx else None
+    except Exception:
+        return None
+
+
+# ======================================================
+# Requests
+# ======================================================
+
+def begin_request(page):
+    """
+    Starts a new timing record for one page run. Call at the top of a
+    page script, right after st.set_page_config.
+    """
+    request = {
+        "id": uuid.uuid4().hex[:8],
+        "page": page,
+        "session": _session_id(),
+        "started": datetime.now(),
+        "t0": time.perf_counter(),
+        "spans": [],
+        "section": None,
+    }
+    _current_request.set(request)
+    _depth.set(0)
+
+    with _lock:
+        _recent.append(request)
+
+    return request
+
+
+def section(name):
+    """
+    Closes the page section opened by the previous call (if any) and
+    opens `name`. Lets long page scripts be split into timed sections
+    without re-indenting them under a `with` block.
+    """
+    request = _current_request.get()
+    if request is None:
+        return
+
+    now = time.perf_counter()
+    if request["section"] is not None:
+        previous, started = request["section"]
+        record(f"{request['page']}.{previous}", now - started, start=started)
+
+    request["section"] = (name, now) if name is not None else None
+
+
+def end_request():
+    section(None)
+
+
+# ======================================================
+# Spans
+# ======================================================
+
+def record(name, seconds, start=None, **fields):
+    """
+    Stores one finished span. Used by span() and by callbacks that
+    measure time themselves (e.g. the Mongo command listener).
+    """
+    request = _current_request.get()
+    ms = seconds * 1000
+
+    entry = {
+        "name": name,
+        "ms": round(ms, 3),
+        "depth": _depth.get(),
+    }
+    if request is not None:
+        started = start if start is not None else time.perf_counter() - seconds
+        entry["offset_ms"] = round((started - request["t0"]) * 1000, 3)
+
+    with _lock:
+        _samples[name].append(ms)
+        if request is not None:
+            request["spans"].append(entry)
+
+    logger.info(json.dumps({
+        "event": "span",
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "request": request["id"] if request else None,
+        "page": request["page"] if request else None,
+        **entry,
+        **fields,
+    }, default=str))
+
+
+@contextmanager
+def span(name, **fields):
+    start = time.perf_counter()
+    token = _depth.set(_depth.get() + 1)
+    try:
+        yield
+    finally:
+        _depth.reset(token)
+        record(name, time.perf_counter() - start, start=start, **fields)
+
+
+@contextmanager
+def memory_span(name, **fields):
+    """
+    span() that also records the memory the stage allocates, read from
+    tracemalloc (NumPy arrays included):
+        alloc_bytes  high-water mark above the memory held at the start
+        net_bytes    what the stage still holds at the end
+    Yields the dict those land in, e.g. for a per-stage report. The
+    counts stay None unless tracemalloc is running (tracemalloc.start()
+    or PYTHONTRACEMALLOC=1). Memory spans may nest.
+    """
+    usage = {"alloc_bytes": None, "net_bytes": None}
+    if not tracemalloc.is_tracing():
+        with span(name, **fields):
+            yield usage
+        return
+
+    # tracemalloc has one global peak: hand the enclosing stage what it
+    # reached so far before resetting it for this one
+    frames = _memory_frames.get()
+    current, peak = tracemalloc.get_traced_memory()
+    if frames:
+        frames[-1]["peak"] = max(frames[-1]["peak"], peak)
+    tracemalloc.reset_peak()
+
+    frame = {"before": current, "peak": current}
+    token = _memory_frames.set(frames + (frame,))
+    start = time.perf_counter()
+    depth = _depth.set(_depth.get() + 1)
+    try:
+        yield usage
+    finally:
+        _depth.reset(depth)
+        _memory_frames.reset(token)
+
+        current, peak = tracemalloc.get_traced_memory()
+        frame["peak"] = max(frame["peak"], peak)
+        if frames:
+            frames[-1]["peak"] = max(frames[-1]["peak"], frame["peak"])
+
+        usage["alloc_bytes"] = frame["peak"] - frame["before"]
+        usage["net_bytes"] = current - frame["before"]
+        record(name, time.perf_counter() - start, start=start, **fields, **usage)
+
+
+def timed(name=None):
+    """
+    Decorator form of span(). Put it above @st.cache_data so cache hits
+    are timed too (that is what the page actually waits for).
+    """
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        # Keep st.cache_data's clear() reachable through the wrapper
+        if hasattr(fn, "clear"):
+            wrapper.clear = fn.clear
+
+        return wrapper
+
+    return decorator
+
+
+# ======================================================
+# Reporting (admin panel)
+# ======================================================
+
+def span_summary():
+    with _lock:
+        samples = {name: list(values) for name, values in _samples.items()}
+
+    rows = [
+        {
+            "Span": name,
+            "Count": len(values),
+            "Mean (ms)": sum(values) / len(values),
+            "P95 (ms)": pd.Series(values).quantile(0.95),
+            "Max (ms)": max(values),
+        }
+        for name, values in samples.items() if values
+    ]
+    columns = ["Span", "Count", "Mean (ms)", "P95 (ms)", "Max (ms)"]
+    return pd.DataFrame(rows, columns=columns).sort_values("Mean (ms)", ascending=False)
+
+
+def recent_requests():
+    with _lock:
+        return [
+            {**r, "spans": list(r["spans"])}
+            for r in reversed(_recent)
+        ]
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+        _samples.clear()
@@ -1,8 +1,9 @@
 import streamlit as st
 import auth_utils
-from mongo_db import users_col
+import instrumentation
 
 st.set_page_config(page_title="Login", layout="centered")
+instrumentation.begin_request("login")
 
 # =====================================================
 # 🔁 REDIRECT IF ALREADY LOGGED IN
@@ -45,25 +46,18 @@ if not st.session_state.show_admin_login:
         if st.button("Login"):
             if not username or not password:
                 st.error("All fields are required")
-            elif auth_utils.login_user(username, password):
-                user = users_col.find_one({
-                    "username": {"$regex": f"^{username}$", "$options": "i"}
-                })
-
-                if not user:
-                    st.error("User not found")
-                else:
-                    # ✅ SESSION STATE (SOURCE OF TRUTH)
-                    st.session_state.authenticated = True
-                    st.session_state.username = user["username"] # Use DB case
-                    st.session_state.user_id = str(user["_id"])
-
-                    # ✅ OPTIONAL (persistence only)
-                    st.query_params["user_id"] = st.session_state.user_id
-                    st.query_params["username"] = username
-
-                    # st.success("Login successful")
-                    st.switch_page("pages/dashboard.py")
+            elif user := auth_utils.login_user(username, password):
+                # ✅ SESSION STATE (SOURCE OF TRUTH)
+                st.session_state.authenticated = True
+                st.session_state.username = user["username"] # Use DB case
+                st.session_state.user_id = str(user["_id"])
+
+                # ✅ OPTIONAL (persistence only)
+                st.query_params["user_id"] = st.session_state.user_id
+                st.query_params["username"] = username
+
+                # st.success("Login successful")
+                st.switch_page("pages/dashboard.py")
             else:
                 st.error("Invalid username or password")
 
@@ -113,3 +107,5 @@ if st.session_state.show_admin_login:
     if st.button("⬅ Back"):
         st.session_state.show_admin_login = False
         st.rerun()
+
+instrumentation.end_request()
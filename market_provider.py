@@ -0,0 +1,233 @@
+"""
+Market data providers.
+
+Everything that needs prices goes through get_provider().download(),
+so the app can run against Yahoo Finance (default) or against local
+fixture files for load tests and benchmarks without network access.
+
+Selected with environment variables:
+    MARKET_DATA_PROVIDER = yahoo | local
+    MARKET_FIXTURES_DIR  = folder with one <symbol>.parquet / .csv per ticker
+
+Create fixtures:
+    python market_provider.py synthetic              # app universe, random walks
+    python market_provider.py synthetic --extra 2000 # + 2000 fake tickers
+    python market_provider.py record                 # app universe from Yahoo
+"""
+import os
+import sys
+import argparse
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+PROVIDER_NAME = os.getenv("MARKET_DATA_PROVIDER", "yahoo").lower()
+
+FIXTURES_DIR = os.getenv(
+    "MARKET_FIXTURES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".market_fixtures")
+)
+
+OHLCV = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _shape(frames, group_by):
+    """
+    {symbol: OHLCV frame} -> one frame with yfinance's column layout:
+    (Price, Ticker) by default, (Ticker, Price) for group_by="ticker".
+    """
+    if not frames:
+        return pd.DataFrame()
+
+    data = pd.concat(frames, axis=1, names=["Ticker", "Price"]).sort_index()
+    if group_by != "ticker":
+        data = data.swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    return data
+
+
+def ohlcv(data, symbol):
+    """
+    OHLCV columns for one symbol out of a download() result,
+    whatever the column layout. Empty DataFrame if absent.
+    """
+    if data is None or data.empty:
+        return pd.DataFrame()
+
+    if not isinstance(data.columns, pd.MultiIndex):
+        return data
+
+    for level in (0, 1):
+        if symbol in data.columns.get_level_values(level):
+            return data.xs(symbol, axis=1, level=level).dropna(how="all")
+
+    return pd.DataFrame()
+
+
+# ======================================================
+# Yahoo Finance
+# ======================================================
+
+class YahooProvider:
+    name = "yahoo"
+
+    def download(self, symbols, period=None, start=None, group_by="column", threads=True):
+        import yfinance as yf
+
+        window = {"start": start} if start is not None else {"period": period}
+        return yf.download(
+            symbols,
+            **window,
+            group_by=group_by,
+            progress=False,
+            auto_adjust=True,   # adjusted prices (safe for indices + ETFs)
+            threads=threads
+        )
+
+
+# ======================================================
+# Local Fixtures (replay)
+# ======================================================
+
+class LocalProvider:
+    """
+    Replays per-ticker fixture files. Periods are measured back from the
+    last date in each file, so recorded data stays usable after it ages.
+    """
+    name = "local"
+
+    def __init__(self, root=FIXTURES_DIR):
+        self.root = root
+
+    def path(self, symbol, fmt="parquet"):
+        return os.path.join(self.root, f"{quote(symbol, safe='')}.{fmt}")
+
+    def read(self, symbol):
+        parquet_path, csv_path = self.path(symbol), self.path(symbol, "csv")
+
+        if os.path.exists(parquet_path):
+            return pd.read_parquet(parquet_path)
+        if os.path.exists(csv_path):
+            return pd.read_csv(csv_path, index_col=0, parse_dates=True)
+        return None
+
+    def write(self, symbol, frame, fmt="parquet"):
+        os.makedirs(self.root, exist_ok=True)
+        frame = frame[OHLCV].rename_axis("Date")
+
+        if fmt == "csv":
+            frame.to_csv(self.path(symbol, "csv"))
+        else:
+            frame.to_parquet(self.path(symbol))
+
+    def download(self, symbols, period=None, start=None, group_by="column", threads=True):
+        from price_store import period_start
+
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        frames = {}
+        for symbol in symbols:
+            frame = self.read(symbol)
+            if frame is None or frame.empty:
+                continue
+
+            since = (
+                pd.Timestamp(start) if start is not None
+                else period_start(period or "1mo", today=frame.index.max())
+            )
+            if since is not None:
+                frame = frame.loc[frame.index >= since]
+
+            frames[symbol] = frame[OHLCV]
+
+        return _shape(frames, group_by)
+
+
+# ======================================================
+# Selection
+# ======================================================
+
+PROVIDERS = {
+    "yahoo": YahooProvider,
+    "local": LocalProvider,
+}
+
+_provider = None
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        if PROVIDER_NAME not in PROVIDERS:
+            raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {PROVIDER_NAME}")
+        _provider = PROVIDERS[PROVIDER_NAME]()
+    return _provider
+
+
+# ======================================================
+# Fixture Generation
+# ======================================================
+
+def synthetic_ohlcv(n_days, seed, end=None):
+    """
+    Geometric random walk with plausible OHLCV bars on business days.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp(end or "today").normalize(), periods=n_days)
+
+    drift = rng.normal(0.0004, 0.0003)
+    vol = rng.uniform(0.01, 0.03)
+    close = rng.uniform(50, 3000) * np.exp(np.cumsum(rng.normal(drift, vol, n_days)))
+
+    open_ = close * (1 + rng.normal(0, vol / 3, n_days))
+    spread = np.abs(rng.normal(0, vol / 2, n_days))
+
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + spread),
+        "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(1e4, 5e6, n_days).astype(float),
+    }, index=dates)
+
+
+def _app_universe():
+    from universe_metrics import universe_tickers, BENCHMARKS
+    return sorted(set(universe_tickers()) | set(BENCHMARKS) | {"^BSESN"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create local market data fixtures.")
+    parser.add_argument("mode", choices=["synthetic", "record"])
+    parser.add_argument("--root", default=FIXTURES_DIR)
+    parser.add_argument("--years", type=int, default=11)
+    parser.add_argument("--extra", type=int, default=0, help="additional synthetic tickers")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    args = parser.parse_args()
+
+    local = LocalProvider(args.root)
+    symbols = _app_universe()
+
+    if args.mode == "record":
+        raw = YahooProvider().download(symbols, period=f"{args.years}y")
+        frames = {s: ohlcv(raw, s) for s in symbols}
+    else:
+        symbols += [f"SYN{i:05d}.NS" for i in range(args.extra)]
+        frames = {
+            s: synthetic_ohlcv(args.years * 261, seed=i)
+            for i, s in enumerate(symbols)
+        }
+
+    written = 0
+    for symbol, frame in frames.items():
+        if not frame.empty:
+            local.write(symbol, frame, args.format)
+            written += 1
+
+    print(f"Wrote {written} fixtures to {args.root}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
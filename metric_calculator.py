@@ -1,9 +1,26 @@
+import os
+import atexit
+import threading
 import numpy as np
 import pandas as pd
 from math import sqrt
 from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
 import streamlit as st
 
+import instrumentation
+import shared_cache
+
+TRADING_DAYS = 252
+WINDOW_YEARS = 10
+MIN_COVERAGE = 0.90
+
+METRIC_COLUMNS = [
+    "Ticker", "CAGR", "Volatility", "Sharpe", "Sortino",
+    "Calmar", "MaxDrawdown", "Beta", "RecoveryDays"
+]
+
 # --------------------------------------------------------------
 # Helper Function (UNCHANGED)
 # --------------------------------------------------------------
@@ -33,140 +50,996 @@ def calculate_recovery_days(series, cummax_series=None):
     return (date_of_recovery - date_of_bottom).days
 
 
+def recovery_days_matrix(prices, running_max, dates):
+    """
+    Matrix form of calculate_recovery_days: one argmin for the trough
+    and one masked argmax for the recovery bar across all columns.
+    Returns calendar days per column (NaN = never recovered).
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = prices / running_max - 1
+
+    n_rows = drawdown.shape[0]
+    cols = np.arange(drawdown.shape[1])
+
+    # Last bar at the deepest drawdown (argmin over the reversed rows)
+    reversed_dd = np.where(np.isnan(drawdown), np.inf, drawdown)[::-1]
+    bottom = n_rows - 1 - reversed_dd.argmin(axis=0)
+    min_dd = drawdown[bottom, cols]
+
+    # First bar from the bottom onwards back at the prior peak
+    target = running_max[bottom, cols]
+    after_bottom = np.arange(n_rows)[:, None] >= bottom
+    recovered = after_bottom & (prices >= target)
+    recovery = recovered.argmax(axis=0)
+
+    days = (dates[recovery] - dates[bottom]) // np.timedelta64(1, "D")
+    days = np.where(recovered.any(axis=0), days, np.nan)
+
+    # No drawdown at all (or nothing to measure) counts as 0 days
+    return np.where((min_dd == 0) | np.isnan(min_dd), 0.0, days)
+
+
 # --------------------------------------------------------------
-# Main Computation Engine (FINAL, CORRECT VERSION)
+# Column-wise NumPy Engine
 # --------------------------------------------------------------
-@st.cache_data(show_spinner=False, ttl=3600)
-def compute_metrics(data, market_ticker, risk_free_rate=0.06):
+def daily_return_matrix(prices, keep=None):
+    """
+    Daily simple returns for a 2-D price array (rows = dates,
+    columns = tickers). Mirrors pct_change().dropna().clip():
+    any row with a missing return is dropped for every column.
+    `keep` overrides which return rows survive (see
+    parallel_metrics_matrix, where a shard sees only its columns).
+    """
+    # One return buffer, updated in place (row-major, as the kernels
+    # below expect it whatever the layout of `prices`)
+    returns = np.empty((max(prices.shape[0] - 1, 0), prices.shape[1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(prices[1:], prices[:-1], out=returns)
+    returns -= 1
+
+    if keep is None:
+        keep = ~np.isnan(returns).any(axis=1)
+    if not keep.all():
+        returns = returns[keep]
+
+    # Remove impossible Yahoo glitches (>50% move in one day)
+    return np.clip(returns, -0.5, 0.5, out=returns)
+
+
+def matrix_metrics(prices, returns, market_col=None, risk_free_rate=0.06):
+    """
+    Computes every point metric except RecoveryDays for all columns
+    of the price matrix at once (see recovery_days_matrix). Returns a
+    dict of 1-D arrays keyed by metric name plus the running-max matrix
+    for drawdown reuse.
+    """
+    n_obs = returns.shape[0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # CAGR (return-based, not price-based)
+        total_return = np.prod(1 + returns, axis=0)
+        years = n_obs / TRADING_DAYS
+        cagr = total_return ** (1 / years) - 1
+
+        # Volatility
+        volatility = returns.std(axis=0, ddof=1) * sqrt(TRADING_DAYS)
+
+        # Sharpe (CAGR-based, consistent)
+        excess = cagr - risk_free_rate
+        sharpe = np.where(volatility != 0, excess / volatility, np.nan)
+
+        # Sortino: std of negative days only, masked per column
+        downside = np.ma.masked_where(returns >= 0, returns)
+        downside_std = (
+            np.ma.filled(downside.std(axis=0, ddof=1), np.nan)
+            * sqrt(TRADING_DAYS)
+        )
+        sortino = np.where(downside_std != 0, excess / downside_std, np.nan)
+
+        # Max Drawdown & Calmar (NaN-aware running max)
+        running_max = np.fmax.accumulate(prices, axis=0)
+        drawdown = prices / running_max - 1
+        max_drawdown = np.nanmin(drawdown, axis=0)
+        calmar = np.where(max_drawdown != 0, cagr / np.abs(max_drawdown), np.nan)
+
+        # Beta via one covariance pass against the market column. A
+        # column-wise sum (not a BLAS product) gives every column the same
+        # result however many columns share the call (see
+        # parallel_metrics_matrix)
+        beta = np.full(returns.shape[1], np.nan)
+        if market_col is not None:
+            centered = returns - returns.mean(axis=0)
+            market = centered[:, market_col].copy()
+            covariance = (centered * market[:, None]).sum(axis=0) / (n_obs - 1)
+            market_var = covariance[market_col]
+            if market_var != 0:
+                beta = covariance / market_var
+
+    return {
+        "CAGR": cagr,
+        "Volatility": volatility,
+        "Sharpe": sharpe,
+        "Sortino": sortino,
+        "Calmar": calmar,
+        "MaxDrawdown": max_drawdown,
+        "Beta": beta,
+        "running_max": running_max,
+    }
+
+
+def compute_metrics_matrix(data, market_ticker, risk_free_rate=0.06):
+    """
+    Uncached engine behind compute_metrics. Expects a price DataFrame
+    that is already cut to the analysis window.
+    """
+    if data is None or data.empty:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+
+    if WORKERS > 1 and len(data.columns) >= PARALLEL_MIN_TICKERS:
+        return parallel_metrics_matrix(data, market_ticker, risk_free_rate)
+
+    min_days_required = int(MIN_COVERAGE * TRADING_DAYS * WINDOW_YEARS)
+
+    prices = data.to_numpy(dtype=np.float64)
+    returns = daily_return_matrix(prices)
+
+    if returns.shape[0] < min_days_required:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+
+    tickers = list(data.columns)
+    market_col = tickers.index(market_ticker) if market_ticker in tickers else None
+
+    metrics = matrix_metrics(prices, returns, market_col, risk_free_rate)
+    running_max = metrics.pop("running_max")
+
+    # ----------------------------------------------------------
+    # Recovery Days
+    # ----------------------------------------------------------
+    metrics["RecoveryDays"] = recovery_days_matrix(
+        prices, running_max, data.index.values
+    )
+
+    return pd.DataFrame({"Ticker": tickers, **metrics})
+
+
+# --------------------------------------------------------------
+# Process-Pool Mode (column shards over shared memory)
+# --------------------------------------------------------------
+# METRICS_WORKERS > 1 makes compute_metrics_matrix split universes of
+# at least METRICS_PARALLEL_MIN_TICKERS tickers across worker processes
+WORKERS = int(os.getenv("METRICS_WORKERS", "0"))
+PARALLEL_MIN_TICKERS = int(os.getenv("METRICS_PARALLEL_MIN_TICKERS", "500"))
+
+# Workers are spawned, not forked: forking the threaded Streamlit
+# server can copy held locks into the child. Pools live for the whole
+# process and are shut down at exit.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(workers):
+    with _pools_lock:
+        if workers not in _pools:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+            atexit.register(pool.shutdown, cancel_futures=True)
+            _pools[workers] = pool
+        return _pools[workers]
+
+
+def _missing_return_rows(prices, block=256):
+    """
+    The return rows daily_return_matrix drops (a missing return in any
+    column), checked a block of columns at a time so the full return
+    matrix is never allocated.
+    """
+    missing = np.zeros(max(prices.shape[0] - 1, 0), dtype=bool)
+    for first in range(0, prices.shape[1], block):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = prices[1:, first:first + block] / prices[:-1, first:first + block] - 1
+        missing |= np.isnan(returns).any(axis=1)
+    return missing
+
+
+def _column_metrics(block, columns, market_col, keep, dates, risk_free_rate):
+    """
+    The compute_metrics_matrix arrays for `columns` of a price block,
+    run on a float64 copy of just those columns. `keep` is the row
+    filter of the whole matrix. The market column rides along for Beta
+    and is dropped from the result.
+    """
+    columns = list(columns)
+    n_own = len(columns)
+    local_market = None
+    if market_col is not None:
+        if market_col not in columns:
+            columns.append(market_col)
+        local_market = columns.index(market_col)
 
+    prices = block[:, columns].astype(np.float64, copy=False)
+
+    returns = daily_return_matrix(prices, keep)
+    metrics = matrix_metrics(prices, returns, local_market, risk_free_rate)
+    running_max = metrics.pop("running_max")
+    metrics["RecoveryDays"] = recovery_days_matrix(prices, running_max, dates)
+
+    return {name: values[:n_own] for name, values in metrics.items()}
+
+
+def _metrics_shard(shm_name, shape, dates, columns, market_col, keep, risk_free_rate):
+    # Worker side of parallel_metrics_matrix
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    try:
+        return _column_metrics(block, columns, market_col, keep, dates, risk_free_rate)
+    finally:
+        # No view may outlive the mapping
+        del block
+        shm.close()
+
+
+def parallel_metrics_matrix(data, market_ticker, risk_free_rate=0.06, workers=None):
+    """
+    compute_metrics_matrix on a process pool. The price matrix is copied
+    once into shared memory and every worker reads its own slice of
+    columns from there (the DataFrame itself is never pickled). The row
+    filter of daily_return_matrix depends on every column, so it is
+    worked out here and handed to the shards.
+
+    Each shard runs the serial kernels on its columns, so the merged
+    frame is identical to the serial result.
+    """
+    workers = workers or max(WORKERS, 2)
+    tickers = list(data.columns)
+    market_col = tickers.index(market_ticker) if market_ticker in tickers else None
+    min_days_required = int(MIN_COVERAGE * TRADING_DAYS * WINDOW_YEARS)
+
+    shape = (len(data), len(tickers))
+    shm = shared_memory.SharedMemory(create=True, size=max(8 * shape[0] * shape[1], 1))
+    try:
+        prices = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        prices[:] = data.to_numpy(dtype=np.float64)
+        keep = ~_missing_return_rows(prices)
+        del prices
+
+        if keep.sum() < min_days_required:
+            return pd.DataFrame(columns=METRIC_COLUMNS)
+
+        # Shards of at least two columns: NumPy sums a single column
+        # pairwise instead of row by row, which could change the last bit
+        shards = max(1, min(workers, len(tickers) // 2))
+        bounds = np.linspace(0, len(tickers), shards + 1).astype(int)
+        pool = get_pool(workers)
+
+        with instrumentation.span("compute_metrics.parallel", tickers=len(tickers), shards=shards):
+            futures = [
+                pool.submit(
+                    _metrics_shard, shm.name, shape, data.index.values,
+                    range(first, last), market_col, keep, risk_free_rate
+                )
+                for first, last in zip(bounds[:-1], bounds[1:])
+            ]
+            results = [f.result() for f in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    metrics = {name: np.concatenate([result[name] for result in results]) for name in results[0]}
+    return pd.DataFrame({"Ticker": tickers, **metrics})
+
+
+# --------------------------------------------------------------
+# Compact Mode (float32 PriceMatrix, column blocks)
+# --------------------------------------------------------------
+COMPACT_BLOCK = 128
+
+
+@instrumentation.timed("compute_metrics_compact")
+def compute_metrics_compact(prices, market_ticker, risk_free_rate=0.06, block=COMPACT_BLOCK, report=None):
+    """
+    compute_metrics for a float32 PriceMatrix (see price_matrix.py and
+    data_fetch.fetch_price_matrix) without ever holding a float64 copy
+    of the universe:
+      * the 10-year window is a view of the rows
+      * the rows daily_return_matrix drops are found a block of
+        columns at a time
+      * the serial kernels run on float64 copies of `block` columns at
+        a time, so their returns / running max / drawdown temporaries
+        are block-sized instead of universe-sized
+    `report`, if given a dict, receives the bytes each stage allocated:
+    {stage: {"alloc_bytes", "net_bytes"}} (see
+    instrumentation.memory_span; needs tracemalloc running).
+    """
+    report = {} if report is None else report
+    min_days_required = int(MIN_COVERAGE * TRADING_DAYS * WINDOW_YEARS)
+
+    with instrumentation.memory_span("compact.window") as report["window"]:
+        window = prices.window(WINDOW_YEARS)
+        width = len(window.tickers)
+
+        # Same column drop as window_prices
+        present = np.concatenate([
+            (~np.isnan(window.values[:, first:first + block])).sum(axis=0)
+            for first in range(0, width, block)
+        ]) if width else np.zeros(0, dtype=int)
+        if not (present >= min_days_required).all():
+            window = window.select(present >= min_days_required)
+            width = len(window.tickers)
+
+    if not width or len(window) < 2:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+
+    with instrumentation.memory_span("compact.row_filter") as report["row_filter"]:
+        keep = ~_missing_return_rows(window.values, block)
+
+    if keep.sum() < min_days_required:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+
+    market_col = window.tickers.index(market_ticker) if market_ticker in window.tickers else None
+    dates = window.dates.values
+
+    with instrumentation.memory_span("compact.kernels", tickers=width, block=block) as report["kernels"]:
+        parts = [
+            _column_metrics(
+                window.values, range(first, min(first + block, width)),
+                market_col, keep, dates, risk_free_rate
+            )
+            for first in range(0, width, block)
+        ]
+        metrics = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    return pd.DataFrame({"Ticker": window.tickers, **metrics})
+
+
+# --------------------------------------------------------------
+# Multi-Horizon Engine (several trailing windows at once)
+# --------------------------------------------------------------
+HORIZONS = (1, 3, 5, 10)
+
+
+def _prefix_sums(x):
+    """
+    Cumulative sums with a leading zero row, so the sum of rows
+    [a, b) of every column is out[b] - out[a]. NaN counts as 0.
+    """
+    out = np.zeros((x.shape[0] + 1, x.shape[1]))
+    np.cumsum(np.nan_to_num(x), axis=0, out=out[1:])
+    return out
+
+
+def multi_horizon_metrics_matrix(data, market_ticker, horizons=HORIZONS, risk_free_rate=0.06):
+    """
+    Uncached engine behind multi_horizon_metrics: the compute_metrics
+    metric set over the trailing 1y / 3y / 5y / 10y (any `horizons`, in
+    years) from one aligned return matrix.
+
+    The return matrix and its prefix sums (growth, demeaned returns and
+    squares, downside returns, market cross products) are built once;
+    every horizon's statistics are then O(1) differences of those sums.
+    Drawdowns reuse the same price matrix: each horizon takes a view of
+    its suffix and one running max over it.
+
+    Each horizon uses compute_metrics' window rule (365 * years calendar
+    days back from the last date) and needs MIN_COVERAGE of its trading
+    days; tickers short of that are left out of that horizon. On a gap-free
+    matrix the numbers equal compute_metrics for the same window.
+
+    Returns a long DataFrame: Ticker, Horizon ("3y"), Metric, Value.
+    """
+    long_columns = ["Ticker", "Horizon", "Metric", "Value"]
     if data is None or data.empty:
-        return pd.DataFrame(columns=[
-            "Ticker", "CAGR", "Volatility", "Sharpe", "Sortino",
-            "Calmar", "MaxDrawdown", "Beta", "RecoveryDays"
-        ])
+        return pd.DataFrame(columns=long_columns)
+
+    tickers = np.asarray(data.columns)
+    dates = data.index.values
+    prices = data.to_numpy(dtype=np.float64)
+    n_rows = prices.shape[0]
 
     # ----------------------------------------------------------
-    # Enforce SAME 10-YEAR WINDOW
+    # Shared intermediates (one pass over the full matrix)
     # ----------------------------------------------------------
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.clip(prices[1:] / prices[:-1] - 1, -0.5, 0.5)
+
+    valid = ~np.isnan(returns)
+    centered = returns - np.nanmean(returns, axis=0)
+    negative = valid & (returns < 0)
+    downside = np.where(negative, returns, np.nan)
+    downside = downside - np.nanmean(downside, axis=0)
+
+    sums = {
+        "n": _prefix_sums(valid),
+        "log": _prefix_sums(np.log1p(returns)),
+        "r": _prefix_sums(centered),
+        "r2": _prefix_sums(centered ** 2),
+        "n_neg": _prefix_sums(negative),
+        "d": _prefix_sums(downside),
+        "d2": _prefix_sums(downside ** 2),
+    }
+    present = _prefix_sums(~np.isnan(prices))
+
+    market_col = list(tickers).index(market_ticker) if market_ticker in tickers else None
+    if market_col is not None:
+        pair = valid & valid[:, [market_col]]
+        own = np.where(pair, centered, np.nan)
+        market = np.where(pair, centered[:, [market_col]], np.nan)
+        sums.update({
+            "n_pair": _prefix_sums(pair),
+            "x": _prefix_sums(own),
+            "m": _prefix_sums(market),
+            "xm": _prefix_sums(own * market),
+            "mm": _prefix_sums(market ** 2),
+        })
+
     end_date = data.index.max()
-    start_date = end_date - timedelta(days=365 * 10)
+    frames = []
+
+    for years in horizons:
+        # Prices [start, n_rows) <-> returns [start, n_rows - 1)
+        start = int(np.searchsorted(dates, (end_date - timedelta(days=365 * years)).to_datetime64()))
+        last = n_rows - 1
+
+        keep = (present[n_rows] - present[start]) >= int(MIN_COVERAGE * TRADING_DAYS * years)
+        if last - start < 1 or not keep.any():
+            continue
+
+        def window(name):
+            return sums[name][last] - sums[name][start]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = window("n")
+            cagr = np.exp(window("log") * TRADING_DAYS / n) - 1
+
+            volatility = np.sqrt(np.maximum(window("r2") - window("r") ** 2 / n, 0) / (n - 1) * TRADING_DAYS)
+
+            excess = cagr - risk_free_rate
+            sharpe = np.where(volatility != 0, excess / volatility, np.nan)
+
+            n_neg = window("n_neg")
+            downside_std = np.sqrt(np.maximum(window("d2") - window("d") ** 2 / n_neg, 0) / (n_neg - 1) * TRADING_DAYS)
+            sortino = np.where(downside_std != 0, excess / downside_std, np.nan)
+
+            beta = np.full(len(tickers), np.nan)
+            if market_col is not None:
+                n_pair = window("n_pair")
+                cov = window("xm") - window("x") * window("m") / n_pair
+                var = window("mm") - window("m") ** 2 / n_pair
+                beta = np.where(var > 0, cov / var, np.nan)
+
+            # Drawdowns on a view of this horizon's prices
+            horizon_prices = prices[start:]
+            running_max = np.fmax.accumulate(horizon_prices, axis=0)
+            max_drawdown = np.nanmin(horizon_prices / running_max - 1, axis=0)
+            calmar = np.where(max_drawdown != 0, cagr / np.abs(max_drawdown), np.nan)
+
+        recovery = recovery_days_matrix(horizon_prices, running_max, dates[start:])
+
+        metrics = {
+            "CAGR": cagr, "Volatility": volatility, "Sharpe": sharpe,
+            "Sortino": sortino, "Calmar": calmar, "MaxDrawdown": max_drawdown,
+            "Beta": beta, "RecoveryDays": recovery,
+        }
+        for metric, values in metrics.items():
+            frames.append(pd.DataFrame({
+                "Ticker": tickers[keep],
+                "Horizon": f"{years}y",
+                "Metric": metric,
+                "Value": values[keep],
+            }))
+
+    if not frames:
+        return pd.DataFrame(columns=long_columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+@instrumentation.timed("multi_horizon_metrics")
+@st.cache_data(show_spinner=False, ttl=3600)
+def multi_horizon_metrics(data, market_ticker, horizons=HORIZONS, risk_free_rate=0.06):
+    """
+    Long-format metrics for several horizons, e.g. one ticker's 3y/5y view:
+        df = multi_horizon_metrics(data, "^NSEI")
+        df[df.Ticker == "INFY.NS"].pivot(index="Metric", columns="Horizon", values="Value")
+    """
+    return multi_horizon_metrics_matrix(data, market_ticker, tuple(horizons), risk_free_rate)
+
+
+# --------------------------------------------------------------
+# Rolling-Window Engine (time series per ticker)
+# --------------------------------------------------------------
+ROLLING_WINDOWS = {"1y": TRADING_DAYS, "3y": 3 * TRADING_DAYS, "5y": 5 * TRADING_DAYS}
+
+ROLLING_METRICS = ["CAGR", "Volatility", "Sharpe", "Sortino", "Beta", "Drawdown"]
+
+
+def _window_sums(x, window):
+    """
+    Trailing `window`-row sums of every column in O(n): one cumulative
+    sum and one subtraction, whatever the window length. NaN counts as 0.
+    """
+    csum = np.cumsum(np.nan_to_num(x), axis=0)
+    out = csum.copy()
+    out[window:] -= csum[:-window]
+    return out
+
+
+def rolling_metrics_matrix(data, market_ticker, windows=None, risk_free_rate=0.06):
+    """
+    Uncached engine behind rolling_metrics. For every date and ticker,
+    the metrics of compute_metrics over the trailing window ending that
+    day, for each window in `windows` (names -> trading days).
+
+    Every statistic is a difference of cumulative sums (sum, sum of
+    squares, cross products, counts), so the whole matrix costs O(n)
+    per window instead of re-running compute_metrics per date.
+    Returns are demeaned per column before squaring (the shifted-data
+    form of the variance) to keep the sums numerically stable.
+
+    Drawdown is the close against the highest close of the window.
+
+    A window needs MIN_COVERAGE of its days to produce a value. Returns
+    a DataFrame indexed by date with columns (Window, Metric, Ticker).
+    """
+    windows = windows or ROLLING_WINDOWS
+    tickers = list(data.columns)
+    prices = data.to_numpy(dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = prices[1:] / prices[:-1] - 1
+    returns = np.vstack([np.full((1, len(tickers)), np.nan), np.clip(returns, -0.5, 0.5)])
+
+    valid = ~np.isnan(returns)
+    centered = returns - np.nanmean(returns, axis=0)
+    log_growth = np.log1p(returns)
+    negative = valid & (returns < 0)
+    neg_centered = np.where(negative, returns, np.nan)
+    neg_centered = neg_centered - np.nanmean(neg_centered, axis=0)
+
+    market_col = tickers.index(market_ticker) if market_ticker in tickers else None
+    if market_col is not None:
+        pair = valid & valid[:, [market_col]]
+        market = np.where(pair, centered[:, [market_col]], np.nan)
+        own = np.where(pair, centered, np.nan)
+
+    frames = {}
+    for name, window in windows.items():
+        n = _window_sums(valid, window)
+        enough = n >= MIN_COVERAGE * window
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # CAGR from the compounded growth inside the window
+            cagr = np.exp(_window_sums(log_growth, window) * TRADING_DAYS / n) - 1
+
+            # Sample std (ddof=1) from sums of demeaned returns
+            s1 = _window_sums(centered, window)
+            s2 = _window_sums(centered ** 2, window)
+            volatility = np.sqrt(np.maximum(s2 - s1 ** 2 / n, 0) / (n - 1) * TRADING_DAYS)
+
+            excess = cagr - risk_free_rate
+            sharpe = np.where(volatility != 0, excess / volatility, np.nan)
+
+            # Sortino: std of the negative days only
+            n_neg = _window_sums(negative, window)
+            d1 = _window_sums(neg_centered, window)
+            d2 = _window_sums(neg_centered ** 2, window)
+            downside = np.sqrt(np.maximum(d2 - d1 ** 2 / n_neg, 0) / (n_neg - 1) * TRADING_DAYS)
+            sortino = np.where(downside != 0, excess / downside, np.nan)
+
+            # Beta over the days both the ticker and the market traded
+            beta = np.full_like(cagr, np.nan)
+            if market_col is not None:
+                n_pair = _window_sums(pair, window)
+                sx = _window_sums(own, window)
+                sm = _window_sums(market, window)
+                sxm = _window_sums(own * market, window)
+                smm = _window_sums(market ** 2, window)
+                cov = sxm - sx * sm / n_pair
+                var = smm - sm ** 2 / n_pair
+                beta = np.where(var > 0, cov / var, np.nan)
+
+        # Rolling max is a monotonic-deque pass in pandas (O(n)); the
+        # window's `window` returns span window + 1 closes
+        high = data.rolling(window + 1, min_periods=1).max().to_numpy(dtype=np.float64)
+        drawdown = prices / high - 1
+
+        for metric, values in zip(ROLLING_METRICS, [cagr, volatility, sharpe, sortino, beta, drawdown]):
+            frames[(name, metric)] = pd.DataFrame(
+                np.where(enough, values, np.nan), index=data.index, columns=tickers
+            )
+
+    result = pd.concat(frames, axis=1, names=["Window", "Metric", "Ticker"])
+    return result
+
+
+@instrumentation.timed("rolling_metrics")
+@st.cache_data(show_spinner=False, ttl=3600)
+def rolling_metrics(data, market_ticker, risk_free_rate=0.06):
+    """
+    Rolling 1y / 3y / 5y CAGR, volatility, Sharpe, Sortino, beta and
+    drawdown for every ticker in `data`, for charts, e.g.:
+        rolling = rolling_metrics(data, "^NSEI")
+        rolling.xs(("Sharpe", "INFY.NS"), axis=1, level=["Metric", "Ticker"])
+    """
+    if data is None or data.empty:
+        return pd.DataFrame()
+
+    return rolling_metrics_matrix(data, market_ticker, risk_free_rate=risk_free_rate)
+
+
+# --------------------------------------------------------------
+# Main Computation Engine (FINAL, CORRECT VERSION)
+# --------------------------------------------------------------
+def window_prices(data):
+    """
+    Enforces the SAME 10-YEAR WINDOW for every ticker and drops the
+    ones without enough history inside it.
+    """
+    end_date = data.index.max()
+    start_date = end_date - timedelta(days=365 * WINDOW_YEARS)
     data = data.loc[data.index >= start_date]
 
-    TRADING_DAYS = 252
-    min_days_required = int(0.90 * TRADING_DAYS * 10)
+    min_days_required = int(MIN_COVERAGE * TRADING_DAYS * WINDOW_YEARS)
+
+    return data.dropna(axis=1, thresh=min_days_required)
 
-    data = data.dropna(axis=1, thresh=min_days_required)
 
-    if data.empty:
-        return pd.DataFrame(columns=[
-            "Ticker", "CAGR", "Volatility", "Sharpe", "Sortino",
-            "Calmar", "MaxDrawdown", "Beta", "RecoveryDays"
-        ])
+@instrumentation.timed("compute_metrics")
+@st.cache_data(show_spinner=False, ttl=3600)
+@shared_cache.cached("compute_metrics", ttl=3600)
+def compute_metrics(data, market_ticker, risk_free_rate=0.06):
+
+    if data is None or data.empty:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
 
     # ----------------------------------------------------------
-    # Daily returns (robust for index + ETF)
+    # All tickers in one pass (see compute_metrics_matrix)
     # ----------------------------------------------------------
-    daily_returns = data.pct_change().dropna()
+    return compute_metrics_matrix(window_prices(data), market_ticker, risk_free_rate)
+
+
+# --------------------------------------------------------------
+# Incremental Engine (one new bar at a time)
+# --------------------------------------------------------------
+def _bar_returns(prices, previous):
+    # Same returns as daily_return_matrix, without dropping rows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.clip(prices / previous - 1, -0.5, 0.5)
 
-    # Remove impossible Yahoo glitches (>50% move in one day)
-    daily_returns = daily_returns.clip(lower=-0.5, upper=0.5)
+
+def _return_sums(returns, market_col, shift, down_shift):
+    """
+    Column sums of a block of returns (rows = bars) for every running
+    total MetricAccumulator keeps. Missing returns contribute 0.
+    """
+    valid = ~np.isnan(returns)
+    centered = np.where(valid, returns - shift, 0.0)
+    negative = valid & (returns < 0)
+    neg_centered = np.where(negative, returns - down_shift, 0.0)
+
+    sums = {
+        "n": valid.sum(axis=0, dtype=np.float64),
+        "log": np.log1p(np.where(valid, returns, 0.0)).sum(axis=0),
+        "s1": centered.sum(axis=0),
+        "s2": (centered ** 2).sum(axis=0),
+        "n_neg": negative.sum(axis=0, dtype=np.float64),
+        "d1": neg_centered.sum(axis=0),
+        "d2": (neg_centered ** 2).sum(axis=0),
+    }
+
+    if market_col is not None:
+        pair = valid & valid[:, [market_col]]
+        own = np.where(pair, centered, 0.0)
+        market = np.where(pair, centered[:, [market_col]], 0.0)
+        sums.update({
+            "n_pair": pair.sum(axis=0, dtype=np.float64),
+            "sx": own.sum(axis=0),
+            "sm": market.sum(axis=0),
+            "sxm": (own * market).sum(axis=0),
+            "smm": (market ** 2).sum(axis=0),
+        })
+
+    return sums
+
+
+def _window_high(prices):
+    """
+    Highest close of every column and the last row it occurs on
+    (-1 for a column with no prices).
+    """
+    filled = np.where(np.isnan(prices), -np.inf, prices)
+    last = prices.shape[0] - 1 - filled[::-1].argmax(axis=0)
+    high = filled[last, np.arange(prices.shape[1])]
+
+    missing = np.isneginf(high)
+    return np.where(missing, np.nan, high), np.where(missing, -1, last)
+
+
+def _drawdown_state(prices):
+    """
+    Max drawdown bookkeeping of a price block, per column, with the same
+    choices as recovery_days_matrix: (max_drawdown, bottom row, peak
+    row, peak price, recovery row). Rows are -1 where there is none.
+    """
+    running_max = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = prices / running_max - 1
+
+    n_rows = prices.shape[0]
+    rows = np.arange(n_rows)[:, None]
+    cols = np.arange(prices.shape[1])
+
+    reversed_dd = np.where(np.isnan(drawdown), np.inf, drawdown)[::-1]
+    bottom = n_rows - 1 - reversed_dd.argmin(axis=0)
+    max_drawdown = drawdown[bottom, cols]
+    target = running_max[bottom, cols]
+
+    recovered = (rows >= bottom) & (prices >= target)
+    recovery = np.where(recovered.any(axis=0), recovered.argmax(axis=0), -1)
+
+    # Last bar at the peak the bottom is measured from
+    at_peak = (rows <= bottom) & (prices == target)
+    peak = n_rows - 1 - at_peak[::-1].argmax(axis=0)
+
+    none = ~(max_drawdown < 0)
+    return (
+        np.where(none, 0.0, max_drawdown),
+        np.where(none, -1, bottom),
+        np.where(none, -1, peak),
+        target,
+        np.where(none, -1, recovery),
+    )
+
+
+class MetricAccumulator:
+    """
+    Running state behind compute_metrics for one benchmark, so the daily
+    refresh adds the new bar instead of re-reading ten years per ticker.
+
+        acc = MetricAccumulator(data, "^NSEI")   # one full pass
+        acc.update(date, closes)                 # per new trading day
+        acc.metrics()                            # compute_metrics frame
+
+    For every ticker it keeps sums over the returns in the window
+    (count, log growth, demeaned first and second moments, the same for
+    down days, and cross products with the benchmark), the window high
+    and the max-drawdown position. update() adds one bar and evicts the
+    bars that fall out of the window by subtracting their sums, which is
+    O(1) per ticker. Only a ticker whose window high or drawdown peak is
+    evicted is re-scanned from the buffered closes.
+
+    On forward-filled prices (as fetch_stock_data returns them) the
+    result matches compute_metrics to rounding. Missing closes are
+    handled per ticker rather than by dropping the day for everyone.
+    """
+
+    # Full re-sum every so often so += / -= rounding cannot build up
+    RESUM_EVERY = TRADING_DAYS
+
+    def __init__(self, data, market_ticker, years=WINDOW_YEARS, risk_free_rate=0.06):
+        self.tickers = list(data.columns)
+        self.market_ticker = market_ticker
+        self.market_col = self.tickers.index(market_ticker) if market_ticker in self.tickers else None
+        self.years = years
+        self.span = np.timedelta64(365 * years, "D")
+        self.risk_free_rate = risk_free_rate
+
+        end_date = data.index.max()
+        data = data.loc[data.index >= end_date - timedelta(days=365 * years)]
+
+        # Window rows live in [start, end) of buffers with a year of slack
+        rows = len(data)
+        capacity = rows + TRADING_DAYS
+        self.dates = np.empty(capacity, dtype="datetime64[ns]")
+        self.prices = np.full((capacity, len(self.tickers)), np.nan)
+        self.dates[:rows] = data.index.values
+        self.prices[:rows] = data.to_numpy(dtype=np.float64)
+        self.start, self.end = 0, rows
+
+        # Demeaning constants (shifted-data variance), fixed from here on
+        returns = _bar_returns(self.prices[1:rows], self.prices[:rows - 1])
+        negative = returns < 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.shift = np.nan_to_num(np.nansum(returns, axis=0) / (~np.isnan(returns)).sum(axis=0))
+            self.down_shift = np.nan_to_num(np.where(negative, returns, 0).sum(axis=0) / negative.sum(axis=0))
+
+        self._resum()
+        self.high, self.high_row = _window_high(self.prices[:rows])
+        self.max_drawdown, self.bottom, self.peak, self.target, self.recovery = _drawdown_state(self.prices[:rows])
+
+    @property
+    def last_date(self):
+        return pd.Timestamp(self.dates[self.end - 1])
 
     # ----------------------------------------------------------
-    # Drawdown prep
+    # Running sums
     # ----------------------------------------------------------
-    cummax_df = data.cummax()
-    drawdown_df = (data / cummax_df) - 1
-    max_drawdowns = drawdown_df.min()
+    def _sums(self, first, last):
+        # Sums of the returns into bars [first, last)
+        returns = _bar_returns(self.prices[first:last], self.prices[first - 1:last - 1])
+        return _return_sums(returns, self.market_col, self.shift, self.down_shift)
+
+    def _resum(self):
+        self.sums = self._sums(self.start + 1, self.end)
+        self._since_resum = 0
+
+    def _add(self, sums, sign=1):
+        for name, value in sums.items():
+            self.sums[name] += sign * value
 
     # ----------------------------------------------------------
-    # Market returns (for beta)
+    # Updates
     # ----------------------------------------------------------
-    market_ret = None
-    market_var = None
-    if market_ticker in daily_returns.columns:
-        market_ret = daily_returns[market_ticker]
-        market_var = market_ret.var()
+    def update(self, date, prices):
+        """
+        Adds the closes of one trading day (a Series indexed by ticker or
+        an array in self.tickers order) and slides the window forward.
+        """
+        date = np.datetime64(pd.Timestamp(date), "ns")
+        if date <= self.dates[self.end - 1]:
+            raise ValueError(f"Bar for {pd.Timestamp(date).date()} is not after {self.last_date.date()}")
+
+        if isinstance(prices, pd.Series):
+            prices = prices.reindex(self.tickers)
+        prices = np.asarray(prices, dtype=np.float64)
+
+        if self.end == len(self.dates):
+            self._compact()
+
+        row = self.end
+        self.dates[row] = date
+        self.prices[row] = prices
+        self.end += 1
+        self._add(self._sums(row, row + 1))
+
+        # Window high: ties move to the newest bar, NaN never wins
+        new_high = ~np.isnan(prices) & ~(prices < self.high)
+        self.high = np.where(new_high, prices, self.high)
+        self.high_row = np.where(new_high, row, self.high_row)
+
+        # Max drawdown: a deeper (or equally deep, later) bottom replaces
+        # the old one; otherwise check whether the old one has recovered
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdown = prices / self.high - 1
+        moved = (drawdown < self.max_drawdown) | ((drawdown == self.max_drawdown) & (self.max_drawdown < 0))
+        recovered = ~moved & (self.max_drawdown < 0) & (self.recovery < 0) & (prices >= self.target)
+
+        self.max_drawdown = np.where(moved, drawdown, self.max_drawdown)
+        self.bottom = np.where(moved, row, self.bottom)
+        self.peak = np.where(moved, self.high_row, self.peak)
+        self.target = np.where(moved, self.high, self.target)
+        self.recovery = np.where(moved, -1, np.where(recovered, row, self.recovery))
+
+        self._evict(date - self.span)
+
+        self._since_resum += 1
+        if self._since_resum >= self.RESUM_EVERY:
+            self._resum()
+
+    def extend(self, data):
+        """
+        Feeds every row of `data` after last_date through update().
+        Returns the number of bars added.
+        """
+        new = data.loc[data.index > self.last_date, self.tickers]
+        for date, prices in zip(new.index, new.to_numpy(dtype=np.float64)):
+            self.update(date, prices)
+        return len(new)
 
-    results = []
+    def _evict(self, cutoff):
+        evicted = False
+        while self.end - self.start > 1 and self.dates[self.start] < cutoff:
+            # The return into the new first bar leaves the window too
+            self._add(self._sums(self.start + 1, self.start + 2), sign=-1)
+            self.start += 1
+            evicted = True
+
+        if not evicted:
+            return
+
+        # Bars before the drawdown peak only ever lower their own
+        # drawdown, so only a ticker that lost its high or its peak
+        # needs a re-scan of the window
+        window = self.prices[self.start:self.end]
+
+        stale = np.flatnonzero((self.high_row >= 0) & (self.high_row < self.start))
+        if stale.size:
+            high, high_row = _window_high(window[:, stale])
+            self.high[stale] = high
+            self.high_row[stale] = np.where(high_row >= 0, high_row + self.start, -1)
+
+        stale = np.flatnonzero((self.peak >= 0) & (self.peak < self.start))
+        if stale.size:
+            max_drawdown, bottom, peak, target, recovery = _drawdown_state(window[:, stale])
+            self.max_drawdown[stale] = max_drawdown
+            self.target[stale] = target
+            for name, rows in (("bottom", bottom), ("peak", peak), ("recovery", recovery)):
+                getattr(self, name)[stale] = np.where(rows >= 0, rows + self.start, -1)
+
+    def _compact(self):
+        # Move the window to the front of the buffers (grown if full)
+        rows = self.end - self.start
+        capacity = max(len(self.dates), rows + TRADING_DAYS)
+
+        dates = np.empty(capacity, dtype="datetime64[ns]")
+        prices = np.full((capacity, len(self.tickers)), np.nan)
+        dates[:rows] = self.dates[self.start:self.end]
+        prices[:rows] = self.prices[self.start:self.end]
+        self.dates, self.prices = dates, prices
+
+        for name in ("high_row", "bottom", "peak", "recovery"):
+            rows_at = getattr(self, name)
+            setattr(self, name, np.where(rows_at >= 0, rows_at - self.start, -1))
+        self.start, self.end = 0, rows
 
     # ----------------------------------------------------------
-    # Metric loop
+    # Results
     # ----------------------------------------------------------
-    for ticker in data.columns:
-        try:
-            series = data[ticker].dropna()
-            ret_series = daily_returns[ticker].dropna()
-
-            if len(ret_series) < min_days_required:
-                continue
-
-            # --------------------------------------------------
-            # ✅ CORRECT CAGR (RETURN-BASED, NOT PRICE-BASED)
-            # --------------------------------------------------
-            total_return = (1 + ret_series).prod()
-            years = len(ret_series) / TRADING_DAYS
-            cagr = total_return ** (1 / years) - 1
-
-            # --------------------------------------------------
-            # Volatility
-            # --------------------------------------------------
-            volatility = ret_series.std() * sqrt(TRADING_DAYS)
-
-            # --------------------------------------------------
-            # Sharpe (CAGR-based, consistent)
-            # --------------------------------------------------
-            sharpe = (
-                (cagr - risk_free_rate) / volatility
-                if volatility != 0 else np.nan
-            )
+    def matches(self, data):
+        """
+        True if `data` holds exactly the closes buffered here for the
+        window's dates, so its newer rows can simply be fed to extend().
+        False after a universe change or a re-adjusted history.
+        """
+        if list(data.columns) != self.tickers:
+            return False
 
-            # --------------------------------------------------
-            # Sortino
-            # --------------------------------------------------
-            downside = ret_series[ret_series < 0]
-            downside_std = downside.std() * sqrt(TRADING_DAYS)
-            sortino = (
-                (cagr - risk_free_rate) / downside_std
-                if downside_std != 0 else np.nan
-            )
+        dates = self.dates[self.start:self.end]
+        held = data.loc[(data.index >= dates[0]) & (data.index <= dates[-1])]
+        if not np.array_equal(held.index.values, dates):
+            return False
 
-            # --------------------------------------------------
-            # Max Drawdown & Calmar
-            # --------------------------------------------------
-            mdd = max_drawdowns[ticker]
-            calmar = cagr / abs(mdd) if mdd != 0 else np.nan
-
-            # --------------------------------------------------
-            # Beta (optional, safe)
-            # --------------------------------------------------
-            beta = (
-                ret_series.cov(market_ret) / market_var
-                if market_ret is not None and market_var not in (0, None)
-                else np.nan
-            )
+        return np.allclose(
+            held.to_numpy(dtype=np.float64), self.prices[self.start:self.end],
+            rtol=1e-9, atol=0, equal_nan=True
+        )
+
+    def metrics(self):
+        """
+        Same frame as compute_metrics for the current window.
+        """
+        s = self.sums
+        n = s["n"]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cagr = np.exp(s["log"] * TRADING_DAYS / n) - 1
+            volatility = np.sqrt(np.maximum(s["s2"] - s["s1"] ** 2 / n, 0) / (n - 1) * TRADING_DAYS)
+
+            excess = cagr - self.risk_free_rate
+            sharpe = np.where(volatility != 0, excess / volatility, np.nan)
+
+            n_neg = s["n_neg"]
+            downside = np.sqrt(np.maximum(s["d2"] - s["d1"] ** 2 / n_neg, 0) / (n_neg - 1) * TRADING_DAYS)
+            sortino = np.where(downside != 0, excess / downside, np.nan)
+
+            calmar = np.where(self.max_drawdown != 0, cagr / np.abs(self.max_drawdown), np.nan)
 
-            # --------------------------------------------------
-            # Recovery Days
-            # --------------------------------------------------
-            recovery = calculate_recovery_days(series, cummax_df[ticker])
+            beta = np.full(len(self.tickers), np.nan)
+            if self.market_col is not None:
+                n_pair = s["n_pair"]
+                cov = s["sxm"] - s["sx"] * s["sm"] / n_pair
+                var = s["smm"] - s["sm"] ** 2 / n_pair
+                beta = np.where(var != 0, cov / var, np.nan)
 
-            results.append({
-                "Ticker": ticker,
-                "CAGR": cagr,
-                "Volatility": volatility,
-                "Sharpe": sharpe,
-                "Sortino": sortino,
-                "Calmar": calmar,
-                "MaxDrawdown": mdd,
-                "Beta": beta,
-                "RecoveryDays": recovery
-            })
+        days = (self.dates[self.recovery] - self.dates[self.bottom]) // np.timedelta64(1, "D")
+        recovery_days = np.where(
+            self.max_drawdown == 0, 0.0, np.where(self.recovery >= 0, days, np.nan)
+        )
 
-        except Exception as e:
-            print(f"Error computing metrics for {ticker}: {e}")
+        metrics = pd.DataFrame({
+            "Ticker": self.tickers,
+            "CAGR": cagr,
+            "Volatility": volatility,
+            "Sharpe": sharpe,
+            "Sortino": sortino,
+            "Calmar": calmar,
+            "MaxDrawdown": self.max_drawdown,
+            "Beta": beta,
+            "RecoveryDays": recovery_days,
+        })
 
+        # Same history requirement as window_prices / compute_metrics
+        min_days_required = int(MIN_COVERAGE * TRADING_DAYS * self.years)
+        return metrics[n >= min_days_required].reset_index(drop=True)
 
-    return pd.DataFrame(results)
 
 # --------------------------------------------------------------
 # Simple Wrapper for One Stock (User Requested)
@@ -1,19 +1,125 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, monitoring
+from pymongo.errors import PyMongoError
 import os
+import time
 import streamlit as st
 import certifi
 
-def get_db():
+import instrumentation
+
+DB_NAME = "stock_market_app"
+
+# Pool / timeout settings (override with environment variables)
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))
+CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+
+# Seconds between pings of the cached client; a failed ping rebuilds it
+HEALTH_CHECK_INTERVAL = float(os.getenv("MONGO_HEALTH_CHECK_SECONDS", "60"))
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    Reports every Mongo command to instrumentation as
+    mongo.<collection>.<command> with the driver-measured duration.
+    """
+
+    def __init__(self):
+        self._names = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        name = f"mongo.{collection}.{event.command_name}" if isinstance(collection, str) else f"mongo.{event.command_name}"
+        self._names[(event.connection_id, event.request_id)] = name
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, **fields):
+        name = self._names.pop((event.connection_id, event.request_id), f"mongo.{event.command_name}")
+        instrumentation.record(name, event.duration_micros / 1e6, **fields)
+
+
+# ======================================================
+# Client (one per process, created on first use)
+# ======================================================
+
+_last_ping = {}
+
+
+def _healthy(client):
+    """
+    st.cache_resource validator. Pings at most every HEALTH_CHECK_INTERVAL
+    seconds; returning False makes Streamlit build a new client.
+    """
+    now = time.monotonic()
+    if now - _last_ping.get(id(client), 0) < HEALTH_CHECK_INTERVAL:
+        return True
+
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        _last_ping.pop(id(client), None)
+        return False
+
+    _last_ping[id(client)] = now
+    return True
+
+
+@st.cache_resource(show_spinner=False, validate=_healthy, on_release=lambda client: client.close())
+def get_client():
     MONGO_URI = os.getenv("MONGO_URI") or st.secrets.get("MONGO_URI")
 
     if not MONGO_URI:
         raise Exception("❌ MONGO_URI not found")
 
-    client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
-    return client["stock_market_app"]
+    client = MongoClient(
+        MONGO_URI,
+        tlsCAFile=certifi.where(),
+        maxPoolSize=MAX_POOL_SIZE,
+        minPoolSize=MIN_POOL_SIZE,
+        maxIdleTimeMS=MAX_IDLE_MS,
+        connectTimeoutMS=CONNECT_TIMEOUT_MS,
+        serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+        socketTimeoutMS=SOCKET_TIMEOUT_MS,
+        retryWrites=True,
+        event_listeners=[CommandTimer()]
+    )
+    # MongoClient connects in the background; the first command waits for it
+    _last_ping[id(client)] = time.monotonic()
+    return client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+class LazyCollection:
+    """
+    Stand-in for a pymongo Collection that resolves the shared client on
+    first use, so importing this module never opens a connection.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def get(self):
+        return get_db()[self.name]
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def __repr__(self):
+        return f"LazyCollection({self.name!r})"
 
-db = get_db()
 
-users_col = db["users"]
-actions_col = db["user_actions"]
-watchlist_col = db["watchlist"]
+users_col = LazyCollection("users")
+actions_col = LazyCollection("user_actions")
+watchlist_col = LazyCollection("watchlist")
+summary_col = LazyCollection("user_summary")
@@ -1,10 +1,18 @@
+import re
+from datetime import datetime, time, timedelta
+
 import streamlit as st
 import pandas as pd
+import pytz
 from bson import ObjectId
 
 from mongo_db import users_col, watchlist_col, actions_col
+import instrumentation
+import user_summary
+import fetch_scheduler
 
 st.set_page_config(page_title="Admin Dashboard", layout="wide")
+instrumentation.begin_request("admin")
 # =====================================================
 # BACK TO LOGIN BUTTON
 # =====================================================
@@ -68,72 +76,88 @@ st.markdown('<h1 class="admin-title">🛠 Admin Dashboard</h1>', unsafe_allow_ht
 st.markdown("Monitor user engagement, manage registered accounts, and track platform activity in real-time.")
 st.divider()
 
+instrumentation.section("data")
+
 # =====================================================
 # DATA FETCHING
 # =====================================================
-users = list(users_col.find({}, {"username": 1, "email": 1, "mobile": 1, "password": 1}))
+# Totals come from collection metadata; per-user numbers come from the
+# materialized user_summary collection (see user_summary.py). Tables
+# below read one page at a time.
+# The rebuild scans every watchlist row and action; it runs from
+# `python user_summary.py` (cron) or the button on the users tab
+summaries_stale = user_summary.needs_rebuild()
 
-watchlist_pipeline = [
-    {
-        "$addFields": {
-            "user_obj_id": { "$toObjectId": "$user_id" }
-        }
-    },
-    {
-        "$lookup": {
-            "from": "users",
-            "localField": "user_obj_id",
-            "foreignField": "_id",
-            "as": "user"
-        }
-    },
-    { "$unwind": "$user" },
-    {
-        "$project": {
-            "_id": 0,
-            "username": "$user.username",
-            "ticker": 1
-        }
-    }
-]
-watchlist_data = list(watchlist_col.aggregate(watchlist_pipeline))
+total_users = users_col.estimated_document_count()
+total_watchlist = watchlist_col.estimated_document_count()
+total_actions = actions_col.estimated_document_count()
+
+PAGE_SIZE = user_summary.PAGE_SIZE
+
+# Dates picked in the filters are days in the app's timezone
+APP_TZ = pytz.timezone("Asia/Kolkata")
+
+
+def pager_state(name, filters):
+    """
+    Keyset cursors of the pages visited so far for one table
+    (stack[-1] is the current page). Resets when the filters change.
+    """
+    state = st.session_state.setdefault(f"{name}_pager", {"filters": None, "stack": [None]})
+    if state["filters"] != filters:
+        state["filters"] = filters
+        state["stack"] = [None]
+    return state
+
+
+def pager_controls(name, state, next_cursor, has_more):
+    c_prev, c_info, c_next = st.columns([1, 4, 1])
+    with c_prev:
+        if st.button("◀ Prev", key=f"{name}_prev", disabled=len(state["stack"]) == 1):
+            state["stack"].pop()
+            st.rerun()
+    with c_info:
+        st.caption(f"Page {len(state['stack'])}")
+    with c_next:
+        if st.button("Next ▶", key=f"{name}_next", disabled=not has_more):
+            state["stack"].append(next_cursor)
+            st.rerun()
 
-activity_pipeline = [
-    {
-        "$addFields": {
-            "user_obj_id": { "$toObjectId": "$user_id" }
-        }
-    },
-    {
-        "$lookup": {
-            "from": "users",
-            "localField": "user_obj_id",
-            "foreignField": "_id",
-            "as": "user"
-        }
-    },
-    { "$unwind": "$user" },
-    {
-        "$project": {
-            "_id": 0,
-            "username": "$user.username",
-            "action": 1,
-            "value": 1
-        }
-    }
-]
-activity_data = list(actions_col.aggregate(activity_pipeline))
+
+USER_FILTER_LIMIT = 500
+
+
+def user_ids_matching(prefix, limit=USER_FILTER_LIMIT):
+    """
+    Ids of the first `limit` users (by name) whose name starts with
+    `prefix`, for {"$in": ...} filters. Warns when more users match,
+    since the rows of the others are then left out.
+    """
+    rows, has_more = user_summary.list_users(prefix=prefix, limit=limit)
+    if has_more:
+        st.warning(f"More than {limit} users start with '{prefix}'; only the first {limit} "
+                   "(by name) are included. Type more of the name to narrow it down.")
+    return [r["_id"] for r in rows]
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def action_types():
+    # distinct scans the whole action index; new types are rare
+    return sorted(a for a in actions_col.distinct("action") if a)
+
+
+instrumentation.section("render")
 
 # =====================================================
 # KEY METRICS
 # =====================================================
 col_m1, col_m2, col_m3 = st.columns(3)
 with col_m1:
-    st.metric(label="👥 Total Registered Users", value=len(users))
+    st.metric(label="👥 Total Registered Users", value=total_users)
 with col_m2:
-    st.metric(label="⭐ Total Watchlist Items", value=len(watchlist_data))
+    st.metric(label="⭐ Total Watchlist Items", value=total_watchlist)
 with col_m3:
-    st.metric(label="📈 Total Activities Logged", value=len(activity_data))
+    st.metric(label="📈 Total Activities Logged", value=total_actions)
 
 st.write("") # Spacer
 st.write("") # Spacer
@@ -141,7 +165,7 @@ st.write("") # Spacer
 # =====================================================
 # TABS FOR DATA
 # =====================================================
-tab1, tab2, tab3 = st.tabs(["👥 Registered Users", "⭐ Watchlists", "📈 User Activity"])
+tab1, tab2, tab3, tab4 = st.tabs(["👥 Registered Users", "⭐ Watchlists", "📈 User Activity", "⏱ Performance"])
 
 with tab1:
     st.subheader("Registered Users Directory")
@@ -156,28 +180,48 @@ with tab1:
             return pwd.decode('utf-8', errors='ignore')
         return str(pwd)
 
-    if users:
+    if total_users:
+        if summaries_stale:
+            st.warning("User summaries are incomplete (users missing or counted only partially). "
+                       "Use 🔄 Rebuild Summaries or run `python user_summary.py`.")
+
         # Search Filter
-        search_user = st.text_input("🔍 Search Users (by Username or Email)", key="search_user").lower()
-        
+        col_s1, col_s2 = st.columns([4, 1])
+        with col_s1:
+            search_user = st.text_input("🔍 Search Users (username starts with)", key="search_user").strip()
+        with col_s2:
+            st.write("")
+            if st.button("🔄 Rebuild Summaries"):
+                with st.spinner("Rebuilding user summaries..."):
+                    user_summary.rebuild()
+                st.rerun()
+
+        state = pager_state("users", search_user.lower())
+        summaries, has_more = user_summary.list_users(after=state["stack"][-1], prefix=search_user)
+
+        # Account details for the rows on this page only
+        details = {
+            str(u["_id"]): u
+            for u in users_col.find(
+                {"_id": {"$in": [ObjectId(r["_id"]) for r in summaries]}},
+                {"email": 1, "mobile": 1, "password": 1}
+            )
+        }
+
         df_users = pd.DataFrame([
             {
-                "User ID": str(u["_id"]), 
-                "Username": u["username"],
-                "Email": u.get("email", "N/A"),
-                "Mobile": u.get("mobile", "N/A"),
-                "Password": format_password(u.get("password", "****"))
+                "User ID": r["_id"],
+                "Username": r.get("username"),
+                "Email": details.get(r["_id"], {}).get("email", "N/A"),
+                "Mobile": details.get(r["_id"], {}).get("mobile", "N/A"),
+                "Password": format_password(details.get(r["_id"], {}).get("password", "****")),
+                "Watchlist": r.get("watchlist_count", 0),
+                "Actions": r.get("action_count", 0),
+                "Last Activity": r.get("last_activity"),
             }
-            for u in users
+            for r in summaries
         ])
-        
-        # Apply filter
-        if search_user:
-            df_users = df_users[
-                df_users["Username"].str.lower().str.contains(search_user) | 
-                df_users["Email"].str.lower().str.contains(search_user)
-            ]
-            
+
         st.dataframe(
             df_users,
             use_container_width=True,
@@ -189,45 +233,105 @@ with tab1:
                     width="medium"
                 ),
                 "Email": st.column_config.TextColumn("Email", width="medium"),
+                "Last Activity": st.column_config.DatetimeColumn("Last Activity", format="YYYY-MM-DD HH:mm"),
             }
         )
+        pager_controls("users", state, summaries[-1]["username_lower"] if summaries else None, has_more)
     else:
         st.info("No registered users found in the database.")
 
 with tab2:
     st.subheader("User Watchlist Preferences")
-    if watchlist_data:
+    if total_watchlist:
         # Search Filter
         col_w1, col_w2 = st.columns(2)
         with col_w1:
-            search_ticker = st.text_input("🔍 Filter by Ticker", key="search_ticker").upper()
+            search_ticker = st.text_input("🔍 Filter by Ticker (starts with)", key="search_ticker").strip().upper()
         with col_w2:
-            search_watch_user = st.text_input("👤 Filter by Username", key="search_w_user").lower()
-            
-        df_watch = pd.DataFrame(watchlist_data)
-        
-        # Apply filters
+            search_watch_user = st.text_input("👤 Filter by Username (starts with)", key="search_w_user").strip().lower()
+
+        query = {}
         if search_ticker:
-            df_watch = df_watch[df_watch["ticker"].str.contains(search_ticker)]
+            query["ticker"] = {"$regex": f"^{re.escape(search_ticker)}"}
         if search_watch_user:
-            df_watch = df_watch[df_watch["username"].str.lower().str.contains(search_watch_user)]
-            
+            query["user_id"] = {"$in": user_ids_matching(search_watch_user)}
+
+        state = pager_state("watchlist", (search_ticker, search_watch_user))
+        if state["stack"][-1] is not None:
+            query["_id"] = {"$gt": state["stack"][-1]}
+
+        items = list(watchlist_col.find(query, {"user_id": 1, "ticker": 1}).sort("_id", 1).limit(PAGE_SIZE + 1))
+        has_more = len(items) > PAGE_SIZE
+        items = items[:PAGE_SIZE]
+
+        names = user_summary.usernames(i["user_id"] for i in items)
+        df_watch = pd.DataFrame(
+            [{"username": names.get(i["user_id"]), "ticker": i["ticker"]} for i in items],
+            columns=["username", "ticker"]
+        )
+
         st.dataframe(df_watch, use_container_width=True, hide_index=True)
+        pager_controls("watchlist", state, items[-1]["_id"] if items else None, has_more)
     else:
         st.info("No watchlist data has been saved by any users yet.")
 
 with tab3:
     st.subheader("Recent User Interactions")
-    if activity_data:
-        df_activity = pd.DataFrame(activity_data)
-        
-        # Search Tool
-        search_act_user = st.text_input("👤 Search by Username", key="search_act_user").lower()
-            
-        # Apply filters
+    if total_actions:
+        # Filters (all applied by Mongo, see db_indexes.py for the indexes)
+        col_a1, col_a2, col_a3 = st.columns([2, 2, 3])
+        with col_a1:
+            search_act_user = st.text_input("👤 Search by Username (starts with)", key="search_act_user").strip().lower()
+        with col_a2:
+            search_action = st.selectbox("🏷 Action Type", ["All"] + action_types(), key="search_action")
+        with col_a3:
+            date_range = st.date_input("📅 Date Range", value=(), key="search_act_dates")
+
+        query = {}
         if search_act_user:
-            df_activity = df_activity[df_activity["username"].str.lower().str.contains(search_act_user)]
-            
+            query["user_id"] = {"$in": user_ids_matching(search_act_user)}
+        if search_action != "All":
+            query["action"] = search_action
+
+        # ObjectIds start with their creation time, so a date range is an
+        # _id range and rides on the same index as the page cursor
+        id_range = {}
+        if len(date_range) >= 1:
+            id_range["$gte"] = ObjectId.from_datetime(APP_TZ.localize(datetime.combine(date_range[0], time.min)))
+        if len(date_range) == 2:
+            id_range["$lt"] = ObjectId.from_datetime(APP_TZ.localize(datetime.combine(date_range[1] + timedelta(days=1), time.min)))
+
+        # Newest first
+        state = pager_state("activity", (search_act_user, search_action, tuple(date_range)))
+        if state["stack"][-1] is not None:
+            id_range["$lt"] = min(id_range.get("$lt", state["stack"][-1]), state["stack"][-1])
+        if id_range:
+            query["_id"] = id_range
+
+        events = list(
+            actions_col.find(query, {"user_id": 1, "action": 1, "value": 1, "timestamp": 1})
+            .sort("_id", -1)
+            .limit(PAGE_SIZE + 1)
+        )
+        has_more = len(events) > PAGE_SIZE
+        events = events[:PAGE_SIZE]
+
+        names = user_summary.usernames(e.get("user_id") for e in events)
+        df_activity = pd.DataFrame(
+            [
+                {
+                    "time": e.get("timestamp") or e["_id"].generation_time,
+                    "username": names.get(e.get("user_id")),
+                    "action": e.get("action"),
+                    "value": e.get("value"),
+                }
+                for e in events
+            ],
+            columns=["time", "username", "action", "value"]
+        )
+        # Mongo returns naive UTC; show the same clock as the date filter
+        df_activity["time"] = pd.to_datetime(df_activity["time"], utc=True).dt.tz_convert(APP_TZ)
+
         # Styling Function for Activity Table
         def highlight_actions(val):
             color = ''
@@ -238,8 +342,68 @@ with tab3:
             elif 'Watchlist' in str(val): color = 'color: #ffd740;'
             return color
 
-        # Apply styling and show
+        # Apply styling and show (one page only)
         styled_df = df_activity.style.applymap(highlight_actions, subset=['action'])
-        st.dataframe(styled_df, use_container_width=True, hide_index=True)
+        st.dataframe(
+            styled_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={"time": st.column_config.DatetimeColumn("time", format="YYYY-MM-DD HH:mm:ss")}
+        )
+        pager_controls("activity", state, events[-1]["_id"] if events else None, has_more)
     else:
-        st.info("No user activity logs have been recorded yet.")
\ No newline at end of file
+        st.info("No user activity logs have been recorded yet.")
+
+with tab4:
+    st.subheader("Hot-Path Timings")
+    st.caption("Spans recorded by this server process since it started (or since the last reset).")
+
+    df_spans = instrumentation.span_summary()
+    if not df_spans.empty:
+        st.dataframe(
+            df_spans,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                col: st.column_config.NumberColumn(col, format="%.1f")
+                for col in ["Mean (ms)", "P95 (ms)", "Max (ms)"]
+            }
+        )
+
+        requests = [r for r in instrumentation.recent_requests() if r["spans"]]
+        if requests:
+            labels = {
+                f"{r['started']:%H:%M:%S} · {r['page']} · {r['id']}": r
+                for r in requests
+            }
+            picked = labels[st.selectbox("🔎 Inspect a page run", list(labels))]
+
+            df_request = pd.DataFrame(picked["spans"]).sort_values("offset_ms", kind="stable")
+            df_request["name"] = [
+                "\u00a0\u00a0" * depth + name
+                for name, depth in zip(df_request["name"], df_request["depth"])
+            ]
+            st.dataframe(
+                df_request[["name", "offset_ms", "ms"]].rename(columns={
+                    "name": "Span", "offset_ms": "Start (ms)", "ms": "Duration (ms)"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+        st.markdown("**Market data fetch scheduler**")
+        fetch_stats = fetch_scheduler.get_scheduler().stats()
+        col_f1, col_f2, col_f3, col_f4, col_f5 = st.columns(5)
+        col_f1.metric("Provider Calls", fetch_stats["calls"])
+        col_f2.metric("Retries", fetch_stats["retries"])
+        col_f3.metric("Errors", fetch_stats["errors"])
+        col_f4.metric("Failed Symbols", fetch_stats["failed_symbols"])
+        col_f5.metric("Throttled (s)", f"{fetch_stats['throttled_seconds']:.1f}")
+
+        if st.button("🧹 Reset Timings"):
+            instrumentation.reset()
+            st.rerun()
+    else:
+        st.info("No timings recorded yet. Open a few pages and come back.")
+
+instrumentation.end_request()
@@ -10,8 +10,9 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import data_fetch
-import metric_calculator
 import scoring_system
+import universe_metrics
+import instrumentation
 
 # --------------------------------------------------
 # PAGE CONFIG
@@ -21,6 +22,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+instrumentation.begin_request("bluechip")
 
 # ==================================================
 # 🔁 RESTORE SESSION FROM URL (ONLY RESTORE)
@@ -127,6 +129,8 @@ div.stButton > button:hover {
 </style>
 """, unsafe_allow_html=True)
 
+instrumentation.section("header")
+
 # ==================================================
 # HEADER
 # ==================================================
@@ -134,6 +138,8 @@ st.markdown("## 💎 Blue-Chip Explorer")
 st.markdown("### Top 10 Risk-Adjusted Long-Term Stocks")
 st.markdown("---")
 
+instrumentation.section("data")
+
 # ==================================================
 # DATA PIPELINE
 # ==================================================
@@ -144,13 +150,14 @@ try:
     if benchmark not in tickers:
         tickers.append(benchmark)
 
-    stock_data = data_fetch.fetch_stock_data(tickers)
-    metrics_df = metric_calculator.compute_metrics(stock_data, benchmark)
+    metrics_df = universe_metrics.get_metrics(tickers, benchmark)
     ranked_df = scoring_system.rank_stocks(metrics_df)
 
     ranked_df = ranked_df[ranked_df["Ticker"] != benchmark]
     top10 = ranked_df.head(10)
 
+    instrumentation.section("cards")
+
     def investor_type(row):
         if row.Volatility > 0.35 or row.MaxDrawdown < -0.6:
             return "Aggressive"
@@ -192,6 +199,8 @@ except Exception as e:
     st.error("Something went wrong while loading Blue-Chip data.")
     st.code(str(e))
 
+instrumentation.section("footer")
+
 # ==================================================
 # EXPLANATION OF TERMS
 # ==================================================
@@ -226,3 +235,5 @@ with c_back:
 with c_dash:
     if st.button("⬅ Dashboard", key="btn_bluechip_dashboard"):
         st.switch_page("pages/dashboard.py")
+
+instrumentation.end_request()
@@ -12,8 +12,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # --- IMPORT OPTIMIZED MODULES ---
 import data_fetch
-import metric_calculator
 import scoring_system
+import universe_metrics
+import metric_calculator
+import instrumentation
 
 # --------------------------------------------------
 # PAGE CONFIG
@@ -24,6 +26,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+instrumentation.begin_request("company")
 
 # ==================================================
 # 🔁 RESTORE SESSION FROM URL (ONLY RESTORE)
@@ -120,16 +123,29 @@ def get_recommendation_text(cagr, sharpe):
 
 def run_analysis(tickers):
     market = "NIFTYBEES.NS"
-    tickers = list(set(tickers + [market]))
 
-    df = data_fetch.fetch_stock_data(tickers)
-    if df.empty:
+    metrics = universe_metrics.get_metrics(tickers, market)
+    if metrics.empty:
         return pd.DataFrame()
 
-    metrics = metric_calculator.compute_metrics(df, market)
     ranked = scoring_system.rank_stocks(metrics)
     return ranked[ranked["Ticker"] != market]
 
+def render_rolling_chart(ticker, metric):
+    market = "NIFTYBEES.NS"
+
+    history = data_fetch.fetch_stock_data([ticker, market])
+    rolling = metric_calculator.rolling_metrics(history, market)
+    if rolling.empty or ticker not in rolling.columns.get_level_values("Ticker"):
+        st.info("Not enough history for rolling metrics.")
+        return
+
+    series = rolling.xs((metric, ticker), axis=1, level=["Metric", "Ticker"])
+    st.line_chart(series.dropna(how="all"))
+    st.caption("Each point is the metric over the trailing window ending that day.")
+
+instrumentation.section("analysis")
+
 # ==================================================
 # MAIN UI
 # ==================================================
@@ -198,6 +214,13 @@ with col1:
 </div>
 """, unsafe_allow_html=True)
 
+        # Expanders run their body even when collapsed: only fetch the
+        # 10-year history once the chart is switched on
+        with st.expander("📈 Rolling Performance (1Y / 3Y / 5Y)"):
+            if st.toggle("Show rolling chart", key="rolling_on_s"):
+                rolling_metric = st.selectbox("Metric", metric_calculator.ROLLING_METRICS, key="rolling_metric_s")
+                render_rolling_chart(row.Ticker, rolling_metric)
+
 # ---------------- MULTI COMPANY ----------------
 with col2:
     st.markdown("<div class='input-box'><b>⚖️ Multi Companies</b></div>", unsafe_allow_html=True)
@@ -259,6 +282,8 @@ with col2:
 </div>
 """, unsafe_allow_html=True)
 
+instrumentation.section("footer")
+
 # ==========================================
 # EXPLANATION OF TERMS
 # ==========================================
@@ -293,3 +318,5 @@ with c_back:
 with c_dash:
     if st.button("⬅ Dashboard", key="btn_company_dashboard"):
         st.switch_page("pages/dashboard.py")
+
+instrumentation.end_request()
@@ -9,10 +9,13 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # import auth_utils
 # --- RESTORED IMPORTS ---
 import pandas as pd
-import yfinance as yf
+import market_provider
+import instrumentation
 import pytz
 from datetime import datetime
 
+instrumentation.begin_request("dashboard")
+
 
 # =====================================================
 # 🔁 RESTORE SESSION FROM URL (VERY IMPORTANT)
@@ -545,10 +548,11 @@ with bh_col2:
 # FEATURE 1: EDUCATIONAL TICKER
 # =============================================================
 
+@instrumentation.timed("market_tape")
 @st.cache_data(ttl=900, show_spinner=False)
 def get_market_data_tape(tickers):
     try:
-        data = yf.download(tickers, period="2d", group_by='ticker', threads=True, progress=False)
+        data = market_provider.get_provider().download(tickers, period="2d", group_by="ticker")
         return data
     except Exception:
         return pd.DataFrame()
@@ -853,4 +857,6 @@ st.markdown("""
         Smart Investor Assistant • v2.0 • Powered by Analytics
     </div>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+instrumentation.end_request()
@@ -5,6 +5,7 @@ import os, sys
 
 import data_fetch
 import metric_calculator
+import instrumentation
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import auth_utils
@@ -19,6 +20,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+instrumentation.begin_request("index")
 
 # =====================================================
 # 🔁 RESTORE SESSION FROM URL (VERY IMPORTANT)
@@ -102,6 +104,8 @@ def normalize(series: pd.Series) -> pd.Series:
     return (series - series.min()) / (series.max() - series.min())
 
 
+instrumentation.section("analysis")
+
 # =====================================================
 # ANALYZE
 # =====================================================
@@ -247,4 +251,6 @@ with c_back:
 
 with c_dash:
     if st.button("⬅ Dashboard", key="btn_index_dashboard"):
-        st.switch_page("pages/dashboard.py")
\ No newline at end of file
+        st.switch_page("pages/dashboard.py")
+
+instrumentation.end_request()
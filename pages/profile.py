@@ -2,8 +2,8 @@ import streamlit as st
 import sys
 import os
 import yfinance as yf
-import data_fetch
-import metric_calculator
+import universe_metrics
+import instrumentation
 from mongo_db import watchlist_col
 from bson import ObjectId
 import pandas as pd
@@ -21,6 +21,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+instrumentation.begin_request("profile")
 
 # =====================================================
 # 🔁 RESTORE SESSION FROM URL (VERY IMPORTANT)
@@ -167,6 +168,8 @@ def get_persona(avg_cagr, avg_sharpe):
 user_id = st.session_state.get("user_id")
 username = st.session_state.get("username")
 
+instrumentation.section("watchlist")
+
 # --------------------------------------------------
 # FETCH WATCHLIST
 # --------------------------------------------------
@@ -183,10 +186,9 @@ if user_id:
         watchlist = list(watchlist_col.find({"user_id": user_id}))
         if watchlist:
             tickers = [item['ticker'] for item in watchlist]
-            # Fetch 10y data for all watchlist stocks + Sensex for reference
-            full_data = data_fetch.fetch_stock_data(tickers + ["^NSEI"])
-            if not full_data.empty:
-                metrics = metric_calculator.compute_metrics(full_data, "^NSEI")
+            # 10y metrics for all watchlist stocks vs Nifty 50 for reference
+            metrics = universe_metrics.get_metrics(tickers, "^NSEI")
+            if not metrics.empty:
                 for item in watchlist:
                     m = metrics[metrics["Ticker"] == item['ticker']]
                     if not m.empty:
@@ -208,6 +210,8 @@ if user_id:
     except Exception as e:
         st.error(f"⚠️ Error loading profile data: {e}")
 
+instrumentation.section("render")
+
 # --------------------------------------------------
 # LAYOUT
 # --------------------------------------------------
@@ -330,4 +334,6 @@ if st.button("⬅ Back to Dashboard"):
     st.switch_page("pages/dashboard.py")
 
 st.write("---")
-st.markdown("<center style='opacity:0.6;'>Smart Investor Assistant</center>", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown("<center style='opacity:0.6;'>Smart Investor Assistant</center>", unsafe_allow_html=True)
+
+instrumentation.end_request()
@@ -1,5 +1,4 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import sys
 import os
@@ -9,13 +8,20 @@ import os
 # --------------------------------------------------
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import data_fetch
+import universe_metrics
 import metric_calculator
-from mongo_db import actions_col, watchlist_col
+import instrumentation
+import market_provider
+import action_log
+import user_summary
+from mongo_db import watchlist_col
+from pymongo.errors import DuplicateKeyError
 
 # --------------------------------------------------
 # PAGE CONFIG
 # --------------------------------------------------
 st.set_page_config(page_title="Stock Search", page_icon="🔍", layout="wide")
+instrumentation.begin_request("search")
 
 # =====================================================
 # 🔁 RESTORE SESSION FROM URL (SOURCE OF TRUTH)
@@ -150,21 +156,19 @@ def get_recommendation_text(cagr, sharpe):
 # --------------------------------------------------
 @st.cache_data(ttl=300)
 def fetch_stock_data(symbol):
-    # Fetch 10y data for long-term metrics
-    full_data = data_fetch.fetch_stock_data([symbol, "^NSEI"])
-    if full_data.empty:
-        return None, "No data found."
-
-    metrics = metric_calculator.compute_metrics(full_data, "^NSEI")
-    if metrics.empty:
+    # 10y long-term metrics (precomputed table, live fallback)
+    metrics = universe_metrics.get_metrics([symbol], "^NSEI")
+    if metrics.empty or symbol not in metrics["Ticker"].values:
         return None, "Could not compute metrics."
     
     row = metrics[metrics["Ticker"] == symbol].iloc[0]
     
-    # Get 5d history for current price info (already in full_data but let's keep logic simple)
-    # yfinance provides easy access
-    stock = yf.Ticker(symbol)
-    hist = stock.history(period="5d")
+    # Get 5d history for current price info
+    recent = market_provider.get_provider().download([symbol], period="5d")
+    hist = market_provider.ohlcv(recent, symbol)
+    if hist.empty:
+        return None, "No recent price data."
+
     latest = hist.iloc[-1]
     price = latest["Close"]
     prev = hist["Close"].iloc[-2] if len(hist) > 1 else price
@@ -207,17 +211,27 @@ def add_to_watchlist(ticker, bound_user_id=None):
         st.toast("⚠ Login required to use watchlist")
         return
 
-    if watchlist_col.find_one({"user_id": user_id, "ticker": ticker}):
+    # One round trip: the unique (user_id, ticker) index makes this idempotent
+    try:
+        result = watchlist_col.update_one(
+            {"user_id": user_id, "ticker": ticker},
+            {"$setOnInsert": {"user_id": user_id, "ticker": ticker}},
+            upsert=True
+        )
+        added = result.upserted_id is not None
+    except DuplicateKeyError:
+        # Concurrent add of the same ticker won the race
+        added = False
+
+    if not added:
         st.toast("⭐ Already in watchlist")
         return
 
-    watchlist_col.insert_one({
-        "user_id": user_id,
-        "ticker": ticker
-    })
-
+    user_summary.record_watchlist_add(user_id)
     st.toast(f"⭐ Saved {ticker}")
 
+instrumentation.section("form")
+
 # --------------------------------------------------
 # UI
 # --------------------------------------------------
@@ -243,12 +257,9 @@ if submitted:
         stock_symbol = selected.split(" – ")[0]
         st.session_state.search_query = stock_symbol
 
-        if actions_col is not None:
-            actions_col.insert_one({
-                "user_id": st.session_state.get("user_id"),
-                "action": "search",
-                "value": stock_symbol
-            })
+        action_log.log_action(st.session_state.get("user_id"), "search", stock_symbol)
+
+instrumentation.section("results")
 
 # --------------------------------------------------
 # DISPLAY RESULTS
@@ -296,12 +307,32 @@ if st.session_state.search_query:
 </div>
 """, unsafe_allow_html=True)
 
+        # ROLLING PERFORMANCE (trailing 1Y / 3Y / 5Y windows). Expanders
+        # run their body even when collapsed, so the 10-year history is
+        # only fetched once the chart is switched on
+        with st.expander("📈 Rolling Performance (1Y / 3Y / 5Y)"):
+            if st.toggle("Show rolling chart", key="rolling_on_search"):
+                symbol_ns = f"{stock_symbol}.NS"
+                rolling_metric = st.selectbox("Metric", metric_calculator.ROLLING_METRICS, key="rolling_metric_search")
+                history = data_fetch.fetch_stock_data([symbol_ns, "^NSEI"])
+                rolling = metric_calculator.rolling_metrics(history, "^NSEI")
+
+                if rolling.empty or symbol_ns not in rolling.columns.get_level_values("Ticker"):
+                    st.info("Not enough history for rolling metrics.")
+                else:
+                    series = rolling.xs((rolling_metric, symbol_ns), axis=1, level=["Metric", "Ticker"])
+                    st.line_chart(series.dropna(how="all"))
+
     else:
         st.error(error)
 
+instrumentation.section("footer")
+
 # --------------------------------------------------
 # FOOTER
 # --------------------------------------------------
 st.markdown("---")
 if st.button("⬅ Back to Dashboard"):
     st.switch_page("pages/dashboard.py")
+
+instrumentation.end_request()
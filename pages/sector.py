@@ -5,8 +5,9 @@ import time
 
 # --- IMPORT OPTIMIZED MODULES ---
 import data_fetch
-import metric_calculator
 import scoring_system
+import universe_metrics
+import instrumentation
 
 import sys
 import os
@@ -24,6 +25,7 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="collapsed"
 )
+instrumentation.begin_request("sector")
 
 # =====================================================
 # 🔁 RESTORE SESSION FROM URL (SOURCE OF TRUTH)
@@ -94,6 +96,8 @@ div.stButton > button:hover {
 # ==========================================
 MARKET_DATA = data_fetch.MARKET_DATA
 
+instrumentation.section("controls")
+
 # ==========================================
 # MAIN UI
 # ==========================================
@@ -131,22 +135,29 @@ with c2:
         st.markdown('<p style="margin-bottom: 24px;"></p>', unsafe_allow_html=True)
         st.info("👈 Please select a category first.")
 
+instrumentation.section("analysis")
+
 # ==========================================
 # ANALYSIS
 # ==========================================
 if start_analysis:
     st.write("---")
     progress = st.progress(0)
+    market_ticker = "NIFTYBEES.NS"
+
+    # One download + one metrics pass for every selected index
+    with st.spinner("Analyzing stocks..."):
+        index_metrics = universe_metrics.get_group_metrics(
+            dict(target_indices), market_ticker
+        )
 
     for i, (idx_name, tickers) in enumerate(target_indices):
         st.markdown(f"### 🔎 {idx_name}")
 
-        with st.spinner("Analyzing stocks..."):
-            market_ticker = "NIFTYBEES.NS"
-            data = data_fetch.fetch_stock_data(tickers + [market_ticker])
+        with st.spinner("Ranking stocks..."):
+            metrics = index_metrics[idx_name]
 
-            if not data.empty:
-                metrics = metric_calculator.compute_metrics(data, market_ticker)
+            if not metrics.empty:
                 ranked = scoring_system.rank_stocks(metrics)
                 top5 = ranked[ranked["Ticker"] != market_ticker].head(5)
 
@@ -195,6 +206,8 @@ if start_analysis:
     st.write("")
     st.success(f"✅ Analysis Complete for {selected_category}")
 
+instrumentation.section("footer")
+
 # ==========================================
 # EXPLANATION OF TERMS
 # ==========================================
@@ -225,3 +238,5 @@ with c_back:
 with c_dash:
     if st.button("⬅ Dashboard", key="btn_sector_dashboard"):
         st.switch_page("pages/dashboard.py")
+
+instrumentation.end_request()
@@ -0,0 +1,275 @@
+import os
+import json
+import uuid
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import market_provider
+
+# ======================================================
+# Local Price Store (one Parquet file per ticker)
+# ======================================================
+# Adjusted close history is kept on disk so a process restart or
+# redeploy does not have to re-download 10 years from Yahoo.
+#
+#   <STORE_DIR>/<quoted symbol>.parquet   -> single "Close" column
+#   <STORE_DIR>/manifest.json             -> per-ticker bookkeeping
+#
+# The manifest records how far back each file was requested
+# ("history_start") and when it was last refreshed ("checked_at").
+
+# Each market data provider gets its own store so fixture prices never
+# mix with real Yahoo history
+STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        ".price_store" if market_provider.PROVIDER_NAME == "yahoo"
+        else f".price_store-{market_provider.PROVIDER_NAME}"
+    )
+)
+
+# Stored history younger than this is served without touching the network
+MAX_AGE = timedelta(hours=24)
+
+MANIFEST_FILE = "manifest.json"
+
+try:
+    import fcntl
+except ImportError:  # Windows: the in-process lock only
+    fcntl = None
+
+
+# ======================================================
+# Period Helpers
+# ======================================================
+
+def period_start(period, today=None):
+    """
+    First calendar date covered by a yfinance period string
+    ("5d", "6mo", "10y", "ytd", "max"). Returns None for "max".
+    """
+    today = pd.Timestamp(today or datetime.now()).normalize()
+
+    if period == "max":
+        return None
+    if period == "ytd":
+        return today.replace(month=1, day=1)
+    if period.endswith("mo"):
+        return today - pd.DateOffset(months=int(period[:-2]))
+    if period.endswith("y"):
+        return today - pd.DateOffset(years=int(period[:-1]))
+    if period.endswith("d"):
+        return today - pd.Timedelta(days=int(period[:-1]))
+
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def _covers(history_start, start):
+    # "max" history covers everything; otherwise it must reach back far enough
+    if history_start is None:
+        return True
+    if start is None:
+        return False
+    return pd.Timestamp(history_start) <= start
+
+
+def _match_tz(ts, index):
+    if ts is None or index.tz is None:
+        return ts
+    return ts.tz_localize(index.tz)
+
+
+# ======================================================
+# Manifest
+# ======================================================
+
+def _path(symbol):
+    return os.path.join(STORE_DIR, f"{quote(symbol, safe='')}.parquet")
+
+
+def read_manifest():
+    try:
+        with open(os.path.join(STORE_DIR, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    target = os.path.join(STORE_DIR, MANIFEST_FILE)
+    tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+_manifest_lock = threading.Lock()
+
+
+@contextmanager
+def _locked_manifest():
+    """
+    Serializes manifest read-modify-writes across threads and, through
+    an flock on manifest.lock, across processes sharing the store.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with _manifest_lock, open(os.path.join(STORE_DIR, "manifest.lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _update_manifest(entries):
+    # Merge into the current file, not a copy read before the downloads
+    if not entries:
+        return
+    with _locked_manifest():
+        manifest = read_manifest()
+        manifest.update(entries)
+        _write_manifest(manifest)
+
+
+# ======================================================
+# Read / Write
+# ======================================================
+
+def history_status(symbol, start, manifest, max_age=None):
+    """
+    "fresh", "stale" or "missing" for `symbol` over a window that
+    begins at `start`. Stale files still cover the window and only
+    need the bars after their last stored date.
+    """
+    max_age = MAX_AGE if max_age is None else max_age
+    entry = manifest.get(symbol)
+
+    if not entry or not os.path.exists(_path(symbol)):
+        return "missing"
+
+    if not _covers(entry.get("history_start"), start):
+        return "missing"
+
+    if datetime.now() - datetime.fromisoformat(entry["checked_at"]) > max_age:
+        return "stale"
+
+    return "fresh"
+
+
+def last_date(symbol, manifest):
+    return pd.Timestamp(manifest[symbol]["last_date"])
+
+
+def load_series(symbol, start=None):
+    """
+    Stored close prices for `symbol` from `start` onwards
+    (None when the file is missing or unreadable).
+    """
+    if not os.path.exists(_path(symbol)):
+        return None
+
+    try:
+        series = pd.read_parquet(_path(symbol))["Close"]
+    except Exception as e:
+        print(f"Price store read error for {symbol}: {e}")
+        return None
+
+    start = _match_tz(start, series.index)
+    if start is not None:
+        series = series.loc[series.index >= start]
+
+    return series.rename(symbol)
+
+
+def _write_series(symbol, series, history_start, now):
+    # Returns the symbol's manifest entry. Write-then-rename like the
+    # manifest, so a crash mid-write never leaves a truncated file.
+    target = _path(symbol)
+    tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        series.to_frame("Close").to_parquet(tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return {
+        "history_start": history_start,
+        "last_date": series.index.max().date().isoformat(),
+        "checked_at": now,
+    }
+
+
+def save_prices(data, start):
+    """
+    Writes every column of a close-price frame to the store and marks
+    it as holding history from `start` (None = "max").
+    """
+    if data is None or data.empty:
+        return
+
+    os.makedirs(STORE_DIR, exist_ok=True)
+    now = datetime.now().isoformat(timespec="seconds")
+    history_start = None if start is None else start.date().isoformat()
+    entries = {}
+
+    for symbol in data.columns:
+        series = data[symbol].dropna()
+        if not series.empty:
+            entries[symbol] = _write_series(symbol, series, history_start, now)
+
+    _update_manifest(entries)
+
+
+def append_prices(tail, overlap_rtol=1e-4):
+    """
+    Merges freshly downloaded bars into the stored history.
+
+    `tail` should start a few bars before each symbol's last stored
+    date. Adjusted closes are rewritten by Yahoo after dividends and
+    splits, so if the overlapping bars disagree the stored history is
+    no longer consistent: such symbols are left untouched and returned
+    so the caller can re-download their full period.
+    """
+    if tail is None or tail.empty:
+        return []
+
+    manifest = read_manifest()
+    now = datetime.now().isoformat(timespec="seconds")
+    rebuild = []
+    entries = {}
+
+    for symbol in tail.columns:
+        new = tail[symbol].dropna()
+        stored = load_series(symbol)
+        if stored is None or symbol not in manifest:
+            rebuild.append(symbol)
+            continue
+
+        overlap = stored.index.intersection(new.index)
+        if len(overlap) and not np.allclose(
+            stored.loc[overlap], new.loc[overlap], rtol=overlap_rtol
+        ):
+            rebuild.append(symbol)
+            continue
+
+        merged = pd.concat([stored, new.loc[new.index > stored.index.max()]])
+        entries[symbol] = _write_series(symbol, merged, manifest[symbol]["history_start"], now)
+
+    _update_manifest(entries)
+    return rebuild
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 import streamlit as st
 
+import instrumentation
+
 # --------------------------------------------------------------
 # Weight Configurations
 # --------------------------------------------------------------
@@ -45,6 +47,7 @@ weight_models = {
 # Core Ranking Engine (Flexible Weights)
 # --------------------------------------------------------------
 
+@instrumentation.timed("rank_with_weights")
 @st.cache_data
 def rank_with_weights(metrics_df, weight_dict):
     if metrics_df.empty:
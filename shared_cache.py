@@ -0,0 +1,388 @@
+"""
+Cache shared by every Streamlit process / replica.
+
+st.cache_data lives inside one process, so each replica behind a load
+balancer would download and score the same histories on its own. The
+functions wrapped with @shared_cache.cached() additionally look in a
+shared backend first, and only one worker computes a missing key at a
+time (the others wait for its result instead of repeating the work).
+
+Selected with environment variables:
+    SHARED_CACHE     = file (default) | redis | off
+    SHARED_CACHE_DIR = folder for the file backend (default .shared_cache)
+    SHARED_CACHE_URL = redis://host:6379/0 for the redis backend
+
+The redis backend takes any client with get / set(nx, px) / delete, so
+tests and single-host setups can pass a local stand-in:
+    shared_cache.set_backend(shared_cache.RedisBackend(client=fakeredis.FakeRedis()))
+"""
+import os
+import time
+import uuid
+import pickle
+import hashlib
+import logging
+import functools
+from contextlib import contextmanager, ExitStack
+
+import pandas as pd
+
+import instrumentation
+
+BACKEND_NAME = os.getenv("SHARED_CACHE", "file").lower()
+
+CACHE_DIR = os.getenv(
+    "SHARED_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".shared_cache")
+)
+REDIS_URL = os.getenv("SHARED_CACHE_URL", "redis://localhost:6379/0")
+
+# A worker holding a compute lock longer than this is presumed dead
+LOCK_TIMEOUT = float(os.getenv("SHARED_CACHE_LOCK_TIMEOUT", "180"))
+LOCK_POLL = 0.1
+
+# How often a process sweeps expired files out of the file backend
+SWEEP_SECONDS = 600
+
+logger = logging.getLogger(__name__)
+
+
+# ======================================================
+# Keys
+# ======================================================
+
+def _fingerprint(value):
+    """
+    Stable bytes for a cache key argument. DataFrames are hashed by
+    content (index, columns and values), everything else by repr.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest = hashlib.sha1(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr(list(value.columns)).encode())
+        return digest.digest()
+    if isinstance(value, dict):
+        return b"{" + b",".join(
+            repr(k).encode() + b":" + _fingerprint(value[k]) for k in sorted(value, key=repr)
+        ) + b"}"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=repr) if isinstance(value, (set, frozenset)) else value
+        return b"[" + b",".join(_fingerprint(v) for v in items) + b"]"
+    return repr(value).encode()
+
+
+def make_key(name, *args, **kwargs):
+    digest = hashlib.sha1(name.encode())
+    for arg in args:
+        digest.update(_fingerprint(arg))
+    for k in sorted(kwargs):
+        digest.update(k.encode() + b"=" + _fingerprint(kwargs[k]))
+    return f"{name}-{digest.hexdigest()}"
+
+
+# ======================================================
+# File Backend (one host, many processes)
+# ======================================================
+
+class FileBackend:
+    """
+    One pickle per key. Each file's mtime is set to its expiry time, so
+    sweep() can find expired entries from a directory listing alone.
+    """
+    name = "file"
+
+    def __init__(self, root=CACHE_DIR):
+        self.root = root
+        self._last_sweep = 0.0
+
+    def _path(self, key, suffix):
+        return os.path.join(self.root, f"{key}.{suffix}")
+
+    def get(self, key):
+        path = self._path(key, "pkl")
+        try:
+            with open(path, "rb") as f:
+                expires, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+        if expires < time.time():
+            _remove_expired(path)
+            return None
+        return value
+
+    def set(self, key, value, ttl):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key, "pkl")
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        expires = time.time() + ttl
+
+        # Write-then-rename so readers never see a partial file
+        with open(tmp, "wb") as f:
+            pickle.dump((expires, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.utime(tmp, (expires, expires))
+        os.replace(tmp, path)
+
+        if time.time() - self._last_sweep > SWEEP_SECONDS:
+            self._last_sweep = time.time()
+            self.sweep()
+
+    def sweep(self):
+        """
+        Deletes expired entries, temp files left by crashed writers and
+        lock files nobody holds for entries that no longer exist.
+        """
+        if not os.path.isdir(self.root):
+            return
+
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if name.endswith(".pkl"):
+                    _remove_expired(path, now)
+                elif name.endswith(".tmp") and os.path.getmtime(path) < now - LOCK_TIMEOUT:
+                    os.remove(path)
+                elif name.endswith(".lock") and not os.path.exists(path[:-len("lock")] + "pkl"):
+                    _remove_idle_lock(path)
+            except OSError:
+                # Raced with another process; the next sweep retries
+                pass
+
+    @contextmanager
+    def lock(self, key, timeout=LOCK_TIMEOUT):
+        """
+        Exclusive advisory lock on <key>.lock. Yields True once held, or
+        False if another worker kept it for longer than `timeout`.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(key, "lock"), "a+b") as f:
+            acquired = _wait(lambda: _try_flock(f), timeout)
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    _unlock(f)
+
+    def clear(self):
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if name.endswith((".pkl", ".tmp")):
+                os.remove(os.path.join(self.root, name))
+
+
+try:
+    import fcntl
+
+    def _try_flock(f):
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(f):
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+except ImportError:  # Windows
+    import msvcrt
+
+    def _try_flock(f):
+        try:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _remove_expired(path, now=None):
+    # Re-checked on the file itself: a fresh entry may have replaced it
+    try:
+        if os.path.getmtime(path) < (now or time.time()):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _remove_idle_lock(path):
+    with open(path, "a+b") as f:
+        if _try_flock(f):
+            try:
+                os.remove(path)
+            finally:
+                _unlock(f)
+
+
+def _wait(try_acquire, timeout):
+    deadline = time.monotonic() + timeout
+    while not try_acquire():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(LOCK_POLL)
+    return True
+
+
+# ======================================================
+# Redis Backend (many hosts)
+# ======================================================
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url=REDIS_URL, client=None, prefix="sia:"):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("SHARED_CACHE=redis needs the 'redis' package") from e
+            client = redis.Redis.from_url(url)
+
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(
+            self.prefix + key,
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+            px=int(ttl * 1000)
+        )
+
+    @contextmanager
+    def lock(self, key, timeout=LOCK_TIMEOUT):
+        # SET NX with an expiry: a crashed holder frees the lock on its own
+        lock_key = f"{self.prefix}lock:{key}"
+        token = uuid.uuid4().hex.encode()
+        acquired = _wait(
+            lambda: bool(self.client.set(lock_key, token, nx=True, px=int(timeout * 1000))),
+            timeout
+        )
+        try:
+            yield acquired
+        finally:
+            # Only release our own lock (it may have expired and been retaken)
+            if acquired and self.client.get(lock_key) == token:
+                self.client.delete(lock_key)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+# ======================================================
+# Selection
+# ======================================================
+
+BACKENDS = {
+    "file": FileBackend,
+    "redis": RedisBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None and BACKEND_NAME != "off":
+        if BACKEND_NAME not in BACKENDS:
+            raise ValueError(f"Unknown SHARED_CACHE: {BACKEND_NAME}")
+        _backend = BACKENDS[BACKEND_NAME]()
+    return _backend
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+# ======================================================
+# Read-through with stampede protection
+# ======================================================
+
+def get_or_compute(key, compute, ttl):
+    """
+    Cached value for `key`, or compute() stored for `ttl` seconds. While
+    one worker computes a key, others asking for it wait on its lock and
+    then read the stored result. Backend errors never fail the call;
+    the value is just computed locally.
+
+    `ttl` may also be a function of the computed value returning the
+    seconds to keep it, or 0 to not store it (e.g. a failed download).
+    """
+    backend = get_backend()
+    if backend is None:
+        return compute()
+
+    try:
+        value = backend.get(key)
+        if value is not None:
+            return value
+        held = ExitStack()
+        acquired = held.enter_context(backend.lock(key))
+    except Exception as e:
+        logger.warning("Shared cache unavailable (%s); computing locally", e)
+        return compute()
+
+    try:
+        # Whoever held the lock before us may have stored it already
+        value = _quietly(backend.get, key)
+        if value is not None:
+            return value
+
+        if not acquired:
+            logger.warning("Shared cache lock timed out for %s; computing anyway", key)
+
+        with instrumentation.span("shared_cache.miss", key=key.split("-")[0]):
+            value = compute()
+        seconds = ttl(value) if callable(ttl) else ttl
+        if value is not None and seconds:
+            _quietly(backend.set, key, value, seconds)
+        return value
+    finally:
+        _quietly(held.close)
+
+
+def _quietly(fn, *args):
+    # Backend hiccups after the lock is taken: log and carry on
+    try:
+        return fn(*args)
+    except Exception as e:
+        logger.warning("Shared cache error (%s)", e)
+        return None
+
+
+def cached(name=None, ttl=3600, key=None):
+    """
+    Decorator for get_or_compute. `key(*args, **kwargs)` may return the
+    arguments that identify a result (defaults to all of them). `ttl`
+    may be a function ttl(result, *args, **kwargs) -> seconds (0 = do
+    not store).
+    """
+    def decorator(fn):
+        prefix = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            parts = key(*args, **kwargs) if key is not None else (args, kwargs)
+            cache_key = make_key(prefix, parts)
+            result_ttl = (lambda value: ttl(value, *args, **kwargs)) if callable(ttl) else ttl
+            return get_or_compute(cache_key, lambda: fn(*args, **kwargs), result_ttl)
+
+        return wrapper
+
+    return decorator
+
+
+def clear():
+    backend = get_backend()
+    if backend is not None:
+        backend.clear()
@@ -0,0 +1,263 @@
+"""
+Precomputed metrics for the whole app universe.
+
+Run once per trading day (e.g. from cron after market close):
+    python universe_metrics.py
+    python universe_metrics.py --force
+
+Pages then call get_metrics(), which slices the stored table and only
+falls back to fetch + compute_metrics when a ticker is not covered.
+
+The job saves a MetricAccumulator per benchmark next to the tables, so
+a normal day only adds the new bars to it; the full ten-year pass runs
+when the universe changed, the stored history was re-adjusted or
+--force is given.
+"""
+import os
+import sys
+import json
+import pickle
+import argparse
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
+
+import pandas as pd
+import streamlit as st
+
+import data_fetch
+import instrumentation
+import metric_calculator
+import price_store
+
+# Benchmarks used across the pages
+BENCHMARKS = ["^NSEI", "NIFTYBEES.NS"]
+
+METRICS_DIR = os.path.join(price_store.STORE_DIR, "metrics")
+MANIFEST_FILE = "manifest.json"
+
+# One trading day plus slack for the job schedule
+MAX_AGE = timedelta(hours=30)
+
+# Prices checked more recently than this are not re-requested by the job
+REFRESH_AGE = timedelta(hours=1)
+
+
+# ======================================================
+# Universe
+# ======================================================
+
+def universe_tickers():
+    tickers = set(data_fetch.BLUECHIP_TICKERS)
+    tickers.update(data_fetch.ETF_INDEX_SYMBOLS.values())
+
+    for indices in data_fetch.MARKET_DATA.values():
+        for index_tickers in indices.values():
+            tickers.update(index_tickers)
+
+    return sorted(data_fetch.nse_symbol(t) for t in tickers)
+
+
+# ======================================================
+# Storage
+# ======================================================
+
+def _table_path(benchmark):
+    return os.path.join(METRICS_DIR, f"{quote(benchmark, safe='')}.parquet")
+
+
+def _state_path(benchmark):
+    return os.path.join(METRICS_DIR, f"{quote(benchmark, safe='')}.state.pkl")
+
+
+def read_manifest():
+    try:
+        with open(os.path.join(METRICS_DIR, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest):
+    target = os.path.join(METRICS_DIR, MANIFEST_FILE)
+    tmp = f"{target}.{os.getpid()}.tmp"
+
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    os.replace(tmp, target)
+
+
+def _load_state(benchmark):
+    try:
+        with open(_state_path(benchmark), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+
+
+def _save_state(benchmark, state):
+    target = _state_path(benchmark)
+    tmp = f"{target}.{os.getpid()}.tmp"
+
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(tmp, target)
+
+
+@st.cache_data(show_spinner=False, max_entries=len(BENCHMARKS))
+def _read_table(path, mtime):
+    # mtime is part of the cache key so a rebuilt table is picked up
+    return pd.read_parquet(path)
+
+
+def is_current(entry, now=None):
+    """
+    A table is current if the job checked it within MAX_AGE, or if its
+    prices already reach the last weekday before today. The job runs
+    after the close on trading days only, so Friday's table serves the
+    weekend (and a holiday run just refreshes checked_at).
+    """
+    now = now or datetime.now()
+    if now - datetime.fromisoformat(entry["checked_at"]) <= MAX_AGE:
+        return True
+
+    previous_weekday = (pd.Timestamp(now.date()) - pd.offsets.BDay(1)).date()
+    return date.fromisoformat(entry["as_of"]) >= previous_weekday
+
+
+def load_table(benchmark):
+    """
+    Stored metrics for `benchmark` plus the set of tickers the job
+    attempted, or (None, set()) when the table is missing or stale.
+    """
+    entry = read_manifest().get(benchmark)
+    path = _table_path(benchmark)
+
+    if not entry or not os.path.exists(path):
+        return None, set()
+
+    if not is_current(entry):
+        return None, set()
+
+    return _read_table(path, os.path.getmtime(path)), set(entry["universe"])
+
+
+# ======================================================
+# Page Lookup
+# ======================================================
+
+@instrumentation.timed("get_metrics")
+def get_metrics(tickers, benchmark):
+    """
+    compute_metrics-shaped frame for `tickers` (benchmark included).
+    Tickers the job attempted but dropped for short history are simply
+    absent, exactly as compute_metrics would leave them out.
+    """
+    symbols = sorted(set(data_fetch.nse_symbol(t) for t in tickers) | {benchmark})
+    table, universe = load_table(benchmark)
+
+    if table is not None and universe.issuperset(symbols):
+        return table[table["Ticker"].isin(symbols)].reset_index(drop=True)
+
+    data = data_fetch.fetch_stock_data(symbols)
+    return metric_calculator.compute_metrics(data, benchmark)
+
+
+@instrumentation.timed("get_group_metrics")
+def get_group_metrics(groups, benchmark):
+    """
+    Metrics for several ticker lists at once ({name: tickers}), e.g. all
+    indices of a sector category. The union is fetched and computed in
+    one pass and then sliced per group, instead of one download and one
+    compute_metrics call per list.
+    """
+    symbols_by_group = {
+        name: set(data_fetch.nse_symbol(t) for t in tickers) | {benchmark}
+        for name, tickers in groups.items()
+    }
+    union = set().union(*symbols_by_group.values())
+
+    metrics = get_metrics(union, benchmark)
+
+    return {
+        name: metrics[metrics["Ticker"].isin(symbols)].reset_index(drop=True)
+        for name, symbols in symbols_by_group.items()
+    }
+
+
+# ======================================================
+# Batch Job
+# ======================================================
+
+def benchmark_metrics(data, benchmark, force=False):
+    """
+    Metrics of `data` against `benchmark` from the saved accumulator
+    when it still agrees with `data` (only the new bars are added),
+    else from a full pass that seeds a new one. Returns (metrics, mode).
+    """
+    state = None if force else _load_state(benchmark)
+
+    if state is not None and state.market_ticker == benchmark and state.matches(data):
+        mode = f"incremental, {state.extend(data)} new bars"
+    else:
+        with instrumentation.span("metric_accumulator.seed", benchmark=benchmark):
+            state = metric_calculator.MetricAccumulator(data, benchmark)
+        mode = "full"
+
+    _save_state(benchmark, state)
+    return state.metrics(), mode
+
+
+def build_tables(force=False):
+    universe = sorted(set(universe_tickers()) | set(BENCHMARKS))
+
+    # Bring every stored ticker up to the latest close (tail downloads
+    # only). The frame is built from exactly these series: the cached
+    # fetch_stock_data frame may predate the refresh.
+    series = data_fetch.load_close_series(universe, max_age=REFRESH_AGE)
+    data = data_fetch.close_frame(series, universe)
+
+    if data.empty:
+        print("No price data available, nothing built.")
+        return False
+
+    as_of = data.index.max().date().isoformat()
+    manifest = read_manifest()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+    now = datetime.now().isoformat(timespec="seconds")
+
+    for benchmark in BENCHMARKS:
+        entry = manifest.get(benchmark)
+
+        # No new trading day since the last build (weekend / holiday)
+        if not force and entry and entry["as_of"] == as_of:
+            entry["checked_at"] = now
+            print(f"{benchmark}: already built for {as_of}")
+            continue
+
+        metrics, mode = benchmark_metrics(data, benchmark, force=force)
+        metrics.to_parquet(_table_path(benchmark))
+
+        manifest[benchmark] = {
+            "as_of": as_of,
+            "checked_at": now,
+            "universe": universe,
+        }
+        print(f"{benchmark}: {len(metrics)} tickers as of {as_of} ({mode})")
+
+    _write_manifest(manifest)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the universe metrics tables.")
+    parser.add_argument("--force", action="store_true", help="rebuild even if already built today")
+    args = parser.parse_args()
+
+    return 0 if build_tables(force=args.force) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
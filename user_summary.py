@@ -0,0 +1,245 @@
+"""
+Materialized per-user summary for the admin dashboard.
+
+One document per user in the user_summary collection:
+    {_id: "<user id>", username, username_lower,
+     watchlist_count, action_count, last_activity}
+
+Kept current incrementally by the write paths (signup, watchlist add,
+action log flush) and rebuilt from scratch by the job below, which also
+backfills it for data written before the summary existed. Run it from
+cron or by hand; the admin page only offers a button:
+    python user_summary.py
+
+A write path that finds no summary (a user older than the collection)
+creates one marked "partial": its counts only cover what happened
+since. needs_rebuild() reports those, and users with no summary at all.
+Ids with no users document (deleted users, edited query strings) are
+not summarized.
+"""
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from mongo_db import get_db, summary_col, users_col
+
+PAGE_SIZE = 25
+
+
+# ======================================================
+# Incremental Updates (write paths)
+# ======================================================
+
+def record_signup(user_id, username):
+    summary_col.update_one(
+        {"_id": str(user_id)},
+        {"$setOnInsert": {
+            "username": username,
+            "username_lower": username.lower(),
+            "watchlist_count": 0,
+            "action_count": 0,
+            "last_activity": None,
+        }},
+        upsert=True
+    )
+
+
+def _known_users(user_ids):
+    """
+    The ids (as strings) that have a summary or a users document.
+    """
+    ids = {str(u) for u in user_ids}
+    known = {doc["_id"] for doc in summary_col.find({"_id": {"$in": list(ids)}}, {"_id": 1})}
+    missing = [ObjectId(u) for u in ids - known if ObjectId.is_valid(u)]
+    if missing:
+        known.update(str(doc["_id"]) for doc in users_col.find({"_id": {"$in": missing}}, {"_id": 1}))
+    return known
+
+
+def record_watchlist_add(user_id):
+    if not _known_users([user_id]):
+        return
+    summary_col.update_one(
+        {"_id": str(user_id)},
+        {
+            "$inc": {"watchlist_count": 1},
+            "$max": {"last_activity": datetime.now(timezone.utc)},
+            "$setOnInsert": {"partial": True},
+        },
+        upsert=True
+    )
+
+
+def record_actions(events):
+    """
+    One bulk write per flushed action-log batch. Events without a user
+    (anonymous searches) are not summarized.
+    """
+    counts = defaultdict(int)
+    latest = {}
+    for event in events:
+        user_id = event.get("user_id")
+        if not user_id:
+            continue
+        counts[user_id] += 1
+        ts = event.get("timestamp")
+        if ts is not None and (user_id not in latest or ts > latest[user_id]):
+            latest[user_id] = ts
+
+    known = _known_users(counts) if counts else set()
+    counts = {user_id: n for user_id, n in counts.items() if str(user_id) in known}
+    if not counts:
+        return
+
+    summary_col.bulk_write([
+        UpdateOne(
+            {"_id": str(user_id)},
+            {
+                "$inc": {"action_count": count},
+                **({"$max": {"last_activity": latest[user_id]}} if user_id in latest else {}),
+                "$setOnInsert": {"partial": True},
+            },
+            upsert=True
+        )
+        for user_id, count in counts.items()
+    ], ordered=False)
+
+
+# ======================================================
+# Full Rebuild (job / backfill)
+# ======================================================
+
+def rebuild():
+    """
+    Recomputes every summary document server-side ($lookup on indexed
+    user_id fields, then $merge); nothing is pulled into the app process.
+
+    The write paths keep incrementing while this runs, so the counts are
+    taken over documents created before the rebuild started, and each
+    summary keeps whatever it gained after its snapshot (_base) on top.
+    Summaries of deleted users are removed at the end.
+    """
+    db = get_db()
+    started = ObjectId.from_datetime(datetime.now(timezone.utc))
+    summary_col.update_many({}, [{"$set": {"_base": {
+        "watchlist_count": {"$ifNull": ["$watchlist_count", 0]},
+        "action_count": {"$ifNull": ["$action_count", 0]},
+    }}}])
+
+    before_start = {"$match": {"_id": {"$lt": started}}}
+    db["users"].aggregate([
+        {"$project": {
+            "_id": {"$toString": "$_id"},
+            "username": 1,
+            # Set at signup; older users get it from `python db_indexes.py`
+            "username_lower": 1,
+        }},
+        {"$lookup": {
+            "from": "watchlist",
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [before_start, {"$count": "n"}],
+            "as": "watchlist",
+        }},
+        {"$lookup": {
+            "from": "user_actions",
+            "localField": "_id",
+            "foreignField": "user_id",
+            "pipeline": [before_start, {"$group": {
+                "_id": None,
+                "n": {"$sum": 1},
+                "last": {"$max": "$timestamp"},
+            }}],
+            "as": "actions",
+        }},
+        {"$project": {
+            "username": 1,
+            "username_lower": 1,
+            "watchlist_count": {"$ifNull": [{"$first": "$watchlist.n"}, 0]},
+            "action_count": {"$ifNull": [{"$first": "$actions.n"}, 0]},
+            "last_activity": {"$first": "$actions.last"},
+        }},
+        {"$merge": {
+            "into": "user_summary",
+            "whenMatched": [{"$set": {
+                "username": "$$new.username",
+                "username_lower": "$$new.username_lower",
+                "watchlist_count": _with_gain("watchlist_count"),
+                "action_count": _with_gain("action_count"),
+                "last_activity": {"$max": ["$last_activity", "$$new.last_activity"]},
+            }}, {"$unset": ["_base", "partial"]}],
+            "whenNotMatched": "insert",
+        }},
+    ])
+
+    # Still carrying a snapshot: not matched above, so the user is gone
+    summary_col.delete_many({"_base": {"$exists": True}})
+    return summary_col.estimated_document_count()
+
+
+def _with_gain(field):
+    # Rebuilt count + increments the write paths made since the snapshot
+    return {"$add": [
+        f"$$new.{field}",
+        # No snapshot: the summary was created after it, so all of it is gain
+        {"$subtract": [{"$ifNull": [f"${field}", 0]}, {"$ifNull": [f"$_base.{field}", 0]}]},
+    ]}
+
+
+def needs_rebuild():
+    """
+    True when some user has no summary yet or only a partial one.
+    """
+    users = get_db()["users"].estimated_document_count()
+    if summary_col.estimated_document_count() != users:
+        return True
+    return summary_col.find_one({"partial": True}, {"_id": 1}) is not None
+
+
+# ======================================================
+# Admin Queries
+# ======================================================
+
+def list_users(after=None, prefix="", limit=PAGE_SIZE):
+    """
+    One page of summaries ordered by username, starting after the
+    username_lower key `after` (keyset pagination on an index, so page
+    N costs the same as page 1). `prefix` filters on the start of the
+    username. Returns (rows, has_more).
+    """
+    prefix = prefix.lower()
+    key = {}
+    if prefix:
+        key = {"$gte": prefix, "$lt": prefix + "\uffff"}
+    if after is not None:
+        key["$gt"] = after
+
+    query = {"username_lower": key} if key else {}
+    rows = list(summary_col.find(query).sort("username_lower", 1).limit(limit + 1))
+    return rows[:limit], len(rows) > limit
+
+
+def usernames(user_ids):
+    """
+    {user_id: username} for the given ids, from the summary collection.
+    """
+    ids = list({str(u) for u in user_ids if u})
+    if not ids:
+        return {}
+    return {
+        doc["_id"]: doc.get("username")
+        for doc in summary_col.find({"_id": {"$in": ids}}, {"username": 1})
+    }
+
+
+def main():
+    total = rebuild()
+    print(f"Rebuilt user_summary ({total} users)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())